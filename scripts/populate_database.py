@@ -3,6 +3,7 @@ import numpy as np
 from supabase import create_client, Client
 import os
 import json
+from pathlib import Path
 
 # Supabase credentials from .env.example
 SUPABASE_URL = 'https://siukegkcregepkwqiora.supabase.co'
@@ -11,21 +12,35 @@ SUPABASE_KEY = 'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJpc3MiOiJzdXBhYmFzZSIsInJ
 # Initialize Supabase client
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Written by the site build's --ingest-photos: remote photo URL -> optimized WebP variants
+PHOTO_MAP_FILE = Path(__file__).resolve().parent.parent / 'data' / 'photo-variants.json'
+
+def load_photo_variants():
+    """Map each ingested photo URL to its variant URLs, or {} before any ingestion."""
+    if not PHOTO_MAP_FILE.exists():
+        return {}
+    with open(PHOTO_MAP_FILE, 'r') as f:
+        photos = json.load(f).get('photos', {})
+    return {url: entry['variants'] for url, entry in photos.items()}
+
 def clean_value(value):
     """Clean a value by handling NaN and None"""
     if pd.isna(value) or value is None:
         return None
     return str(value).strip()
 
-def prepare_record(record):
+def prepare_record(record, photo_variants=None):
     """Prepare a record by mapping CSV data to Supabase table columns"""
+    photo = clean_value(record.get("photo_1"))
+    # Serve our own optimized copy once the photo has been ingested, instead of hot-linking it
+    photo = (photo_variants or {}).get(photo, {}).get('medium', photo)
     data = {
         "name": clean_value(record.get("name")),
         "city": clean_value(record.get("city")),
         "state": clean_value(record.get("state")),
         "latitude": clean_value(record.get("latitude")),
         "longitude": clean_value(record.get("longitude")),
-        "photo_1": clean_value(record.get("photo_1"))
+        "photo_1": photo
     }
     
     # Remove None values
@@ -50,6 +65,9 @@ def main():
         print(f"Found {len(df)} total records")
         print(f"Available columns in CSV: {', '.join(df.columns)}")
         
+        photo_variants = load_photo_variants()
+        print(f"Using optimized variants for {len(photo_variants)} ingested photos")
+
         success_count = 0
         error_count = 0
 
@@ -57,7 +75,7 @@ def main():
         for index, record in df.iterrows():
             try:
                 # Clean and prepare the data
-                data = prepare_record(record)
+                data = prepare_record(record, photo_variants)
 
                 print(f"\nTrying to insert record {index + 1}:")
                 print(f"Data: {json.dumps(data, indent=2)}")
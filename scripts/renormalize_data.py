@@ -0,0 +1,182 @@
+"""Re-normalize the existing magician datasets in bulk.
+
+Loads data/magicians.csv, data/processed-magicians.json and
+data/magician-listings.json into one pandas frame, applies the scraper's
+service, phone, price and text normalization column by column, and writes
+a normalized snapshot.
+
+    python scripts/renormalize_data.py --output data/normalized-magicians.json
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+from scraper.normalizer import PRICE_PATTERN, Normalizer  # noqa: E402
+
+COLUMNS = [
+    'name', 'business_name', 'city', 'state', 'latitude', 'longitude', 'phone', 'email',
+    'website', 'services', 'description', 'rating', 'starting_price', 'price_range',
+    'photos', 'source', 'source_file'
+]
+PHOTO_COLUMNS = [f'photo_{number}' for number in range(1, 9)]
+
+
+def _frame(df, source_file, **columns):
+    """Project a loaded source onto COLUMNS, given {target: source column}."""
+    out = pd.DataFrame(index=df.index)
+    for column in COLUMNS:
+        source_column = columns.get(column)
+        out[column] = df[source_column] if source_column in df.columns else None
+    out['source_file'] = source_file
+    return out
+
+
+def load_csv(path):
+    df = pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[''])
+    # 'Magician; Service establishment' -> list of services
+    df['services_list'] = df['types'].fillna('').str.split(';')
+    photos = [column for column in PHOTO_COLUMNS if column in df.columns]
+    df['photos_list'] = [[url for url in row if isinstance(url, str)] for row in df[photos].to_numpy()]
+    df['source'] = 'google_maps'
+    return _frame(
+        df, path.name, name='name', city='city', state='state', latitude='latitude',
+        longitude='longitude', rating='rating', services='services_list', photos='photos_list', source='source'
+    )
+
+
+def load_processed(path):
+    with open(path, 'r') as f:
+        df = pd.json_normalize(json.load(f))
+    df['source'] = 'processed'
+    return _frame(
+        df, path.name, name='name', business_name='businessName', city='location.city',
+        state='location.state', latitude='location.coordinates.lat', longitude='location.coordinates.lng',
+        email='contact.email', website='contact.website', services='services', description='description',
+        source='source'
+    )
+
+
+def load_listings(path):
+    with open(path, 'r') as f:
+        df = pd.json_normalize(json.load(f))
+    return _frame(
+        df, path.name, name='name', business_name='businessName', city='location.city',
+        state='location.state', phone='phone', email='email', website='website', services='services',
+        description='description', starting_price='pricing.starting_price', price_range='pricing.price_range',
+        source='source'
+    )
+
+
+LOADERS = {
+    'magicians.csv': load_csv,
+    'processed-magicians.json': load_processed,
+    'magician-listings.json': load_listings
+}
+
+
+def clean_text(series):
+    """Vectorized Normalizer.clean_text: drop HTML entities, collapse whitespace, blank -> NA."""
+    text = series.astype('string')
+    text = text.str.replace('&nbsp;', ' ', regex=False).str.replace('&amp;', '&', regex=False)
+    text = text.str.replace(r'\s+', ' ', regex=True).str.strip()
+    return text.mask(text == '')
+
+
+def normalize_services(series, normalizer):
+    """Normalize each distinct service list once and map the result back onto every row."""
+    keys = series.map(lambda value: tuple(value) if isinstance(value, list) else ())
+    codes, uniques = pd.factorize(keys)
+    normalized = np.empty(len(uniques), dtype=object)
+    normalized[:] = [normalizer.normalize_services(services) for services in uniques]
+    return pd.Series(normalized[codes], index=series.index)
+
+
+def normalize_phones(series):
+    """Vectorized format_phone: (XXX) XXX-XXXX for 10 or 1+10 digits, else the original."""
+    phones = series.astype('string')
+    digits = phones.str.replace(r'\D+', '', regex=True)
+    digits = digits.mask((digits.str.len() == 11) & digits.str.startswith('1'), digits.str[1:])
+    formatted = '(' + digits.str[:3] + ') ' + digits.str[3:6] + '-' + digits.str[6:]
+    return formatted.where(digits.str.len() == 10, phones).mask(phones.fillna('') == '')
+
+
+def extract_prices(series):
+    """First and second price of each value, as Normalizer reads them.
+
+    Numbers are already prices and are kept as the first price; only text goes
+    through PRICE_PATTERN, which needs a currency symbol.
+    """
+    numeric = pd.to_numeric(series, errors='coerce')
+    text = series.where(numeric.isna()).astype('string')
+    matches = text.str.extractall(PRICE_PATTERN)[0].str.replace(',', '', regex=False).astype(float)
+    first = matches.xs(0, level='match').reindex(series.index) if len(matches) else pd.Series(np.nan, index=series.index)
+    second = matches.xs(1, level='match').reindex(series.index) \
+        if len(matches) and 1 in matches.index.get_level_values('match') else pd.Series(np.nan, index=series.index)
+    return numeric.fillna(first), second
+
+
+def normalize_frame(df, normalizer):
+    df = df.copy()
+    for column in ('name', 'business_name', 'city', 'state', 'description', 'email', 'website'):
+        df[column] = clean_text(df[column])
+    df['services'] = normalize_services(df['services'], normalizer)
+    df['phone'] = normalize_phones(df['phone'])
+    df['rating'] = pd.to_numeric(df['rating'], errors='coerce')
+    df['latitude'] = pd.to_numeric(df['latitude'], errors='coerce')
+    df['longitude'] = pd.to_numeric(df['longitude'], errors='coerce')
+    df['starting_price'], _ = extract_prices(df['starting_price'])
+    df['price_min'], df['price_max'] = extract_prices(df['price_range'])
+    df['photos'] = df['photos'].map(lambda value: value if isinstance(value, list) else [])
+    return df.drop(columns=['price_range'])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Re-normalize existing magician datasets into one snapshot.')
+    parser.add_argument('--data-dir', type=Path, default=ROOT / 'data')
+    parser.add_argument('--sources', nargs='+', default=list(LOADERS), help='source files in --data-dir')
+    parser.add_argument('--output', type=Path, default=ROOT / 'data' / 'normalized-magicians.json',
+                        help='.json (records) or .csv')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    start = time.perf_counter()
+    frames = []
+    for source in args.sources:
+        path = args.data_dir / source
+        loader = LOADERS.get(path.name) or (load_csv if path.suffix == '.csv' else load_listings)
+        frames.append(loader(path))
+        print(f"Loaded {len(frames[-1])} rows from {path.name}")
+    df = pd.concat(frames, ignore_index=True)
+    loaded = time.perf_counter()
+
+    df = normalize_frame(df, Normalizer())
+    normalized = time.perf_counter()
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = args.output.with_suffix(args.output.suffix + '.tmp')
+    if args.output.suffix == '.csv':
+        df.assign(
+            services=df['services'].str.join('; '), photos=df['photos'].str.join(' ')
+        ).to_csv(tmp_path, index=False)
+    else:
+        df.to_json(tmp_path, orient='records')
+    tmp_path.replace(args.output)
+
+    print(
+        f"Normalized {len(df)} rows in {normalized - loaded:.2f}s "
+        f"(load {loaded - start:.2f}s, write {time.perf_counter() - normalized:.2f}s) -> {args.output}"
+    )
+
+
+if __name__ == '__main__':
+    main()
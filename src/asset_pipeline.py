@@ -0,0 +1,155 @@
+import hashlib
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import rjsmin
+except ImportError:  # JS is copied unminified without it
+    rjsmin = None
+
+_PRESERVED_BLOCK = re.compile(r'<(pre|textarea|script|style)\b([^>]*)>(.*?)</\1\s*>', re.S | re.I)
+_HTML_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.S)
+_WHITESPACE = re.compile(r'\s+')
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+
+
+def _collapse_whitespace(match: re.Match) -> str:
+    # A run containing a newline renders like a single space but keeps lines readable
+    return '\n' if '\n' in match.group(0) else ' '
+
+
+def minify_css(css: str) -> str:
+    """Strip comments and redundant whitespace from a stylesheet."""
+    css = _CSS_COMMENT.sub('', css)
+    css = _WHITESPACE.sub(' ', css)
+    css = _CSS_PUNCTUATION.sub(r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_js(js: str) -> str:
+    """Minify a script with rjsmin, or return it unchanged when rjsmin is missing."""
+    if rjsmin is None:
+        return js
+    return rjsmin.jsmin(js)
+
+
+def _minify_block(match: re.Match) -> str:
+    tag, attrs, body = match.group(1).lower(), match.group(2), match.group(3)
+    if tag == 'style':
+        body = minify_css(body)
+    elif tag == 'script' and 'application/ld+json' in attrs:
+        try:
+            body = json.dumps(json.loads(body), separators=(',', ':'), ensure_ascii=False)
+        except ValueError:
+            pass
+    elif tag == 'script' and 'src=' not in attrs:
+        body = minify_js(body).strip()
+    return f"<{match.group(1)}{attrs}>{body}</{match.group(1)}>"
+
+
+def minify_html(html: str) -> str:
+    """Drop comments and indentation from HTML, leaving pre/textarea content intact."""
+    output, position = [], 0
+    for match in _PRESERVED_BLOCK.finditer(html):
+        text = _HTML_COMMENT.sub('', html[position:match.start()])
+        output.append(_WHITESPACE.sub(_collapse_whitespace, text))
+        output.append(_minify_block(match))
+        position = match.end()
+    text = _HTML_COMMENT.sub('', html[position:])
+    output.append(_WHITESPACE.sub(_collapse_whitespace, text))
+    return ''.join(output).strip()
+
+
+class AssetPipeline:
+    """Minifies and fingerprints static assets and rewrites references to them in pages.
+
+    Instances are callable on rendered HTML and picklable, so render workers
+    can apply the same rewriting and minification as the parent.
+    """
+
+    MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+    def __init__(self, static_dir: Path, url_prefix: str = '/static', minify: bool = False,
+                 fingerprint: bool = False):
+        self.static_dir = Path(static_dir)
+        self.url_prefix = url_prefix.rstrip('/')
+        self.minify = minify
+        self.fingerprint = fingerprint
+        self.asset_map: Dict[str, str] = {}
+        self._pattern: Optional[re.Pattern] = None
+        self.logger = logging.getLogger(__name__)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_pattern'] = None
+        del state['logger']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def enabled(self) -> bool:
+        return self.minify or self.fingerprint
+
+    def process(self, asset_types: List[str]) -> List[Tuple[Path, Path, bytes]]:
+        """Process static files into (source, output path relative to static/, bytes).
+
+        Also fills asset_map with original URL -> fingerprinted URL.
+        """
+        assets = []
+        self.asset_map = {}
+        self._pattern = None
+        saved = 0
+        for asset_type in asset_types:
+            src_dir = self.static_dir / asset_type
+            if not src_dir.exists():
+                continue
+            for file in sorted(src_dir.glob('**/*')):
+                if not file.is_file():
+                    continue
+                data = file.read_bytes()
+                minifier = self.MINIFIERS.get(file.suffix) if self.minify else None
+                if minifier is not None:
+                    minified = minifier(data.decode('utf-8')).encode('utf-8')
+                    saved += len(data) - len(minified)
+                    data = minified
+
+                relative = file.relative_to(self.static_dir)
+                if self.fingerprint:
+                    digest = hashlib.sha256(data).hexdigest()[:10]
+                    hashed = relative.with_name(f"{relative.stem}.{digest}{relative.suffix}")
+                    self.asset_map[f"{self.url_prefix}/{relative.as_posix()}"] = f"{self.url_prefix}/{hashed.as_posix()}"
+                    relative = hashed
+                assets.append((file, relative, data))
+
+        if self.minify:
+            self.logger.info(f"Minified static assets, {saved} bytes saved")
+        if self.minify and rjsmin is None:
+            self.logger.warning("rjsmin is not installed, JavaScript was copied unminified")
+        return assets
+
+    def cache_key(self) -> str:
+        """Hash of everything that changes the finished HTML, for the build manifest."""
+        return hashlib.sha256(
+            json.dumps([self.minify, self.asset_map], sort_keys=True).encode('utf-8')
+        ).hexdigest()
+
+    def __call__(self, html: str) -> str:
+        """Rewrite asset references and minify a rendered page."""
+        if self.asset_map:
+            if self._pattern is None:
+                urls = sorted(self.asset_map, key=len, reverse=True)
+                self._pattern = re.compile(
+                    r'(?<=["\'(])(' + '|'.join(re.escape(url) for url in urls) + r')(?=["\')?#])'
+                )
+            html = self._pattern.sub(lambda match: self.asset_map[match.group(1)], html)
+        if self.minify:
+            html = minify_html(html)
+        return html
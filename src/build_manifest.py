@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from precompress import remove_variants
+
+
+class BuildManifest:
+    """Persisted map of build outputs to the hash of the inputs that produced them.
+
+    Each entry also keeps the date its inputs last changed, which the sitemap
+    uses as the page's lastmod.
+    """
+
+    VERSION = 2
+
+    def __init__(self, output_dir: Path, incremental: bool = False):
+        self.output_dir = Path(output_dir)
+        self.path = self.output_dir / '.build-manifest.json'
+        self.incremental = incremental
+        self.logger = logging.getLogger(__name__)
+        self.entries: Dict[str, Dict[str, str]] = self._load()
+        self.build_date = date.today().isoformat()
+        self._file_hashes: Dict[Path, str] = {}
+        self.rendered = 0
+        self.skipped = 0
+        self.removed = 0
+
+    def _load(self) -> Dict[str, Dict[str, str]]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable build manifest {self.path}: {str(e)}")
+            return {}
+        if manifest.get('version') != self.VERSION:
+            return {}
+        return manifest.get('outputs', {})
+
+    def save(self):
+        """Write the manifest next to the build output."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': self.VERSION, 'outputs': self.entries}, f, indent=2, sort_keys=True)
+        tmp_path.replace(self.path)
+
+    def file_hash(self, path: Path) -> str:
+        """Hash a source file's contents, memoized for the duration of the build."""
+        path = Path(path)
+        if path not in self._file_hashes:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(65536), b''):
+                    digest.update(chunk)
+            self._file_hashes[path] = digest.hexdigest()
+        return self._file_hashes[path]
+
+    @staticmethod
+    def hash_inputs(*inputs: Any) -> str:
+        """Hash JSON-serializable build inputs into a stable digest."""
+        payload = json.dumps(inputs, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _key(self, output_path: Path) -> str:
+        return Path(output_path).relative_to(self.output_dir).as_posix()
+
+    def is_current(self, output_path: Path, digest: str) -> bool:
+        """Return True if the output exists and was built from the same inputs."""
+        current = (
+            self.incremental
+            and self.entries.get(self._key(output_path), {}).get('hash') == digest
+            and Path(output_path).exists()
+        )
+        if current:
+            self.skipped += 1
+        return current
+
+    def record(self, output_path: Path, digest: str):
+        """Record the inputs an output was just built from."""
+        key = self._key(output_path)
+        previous = self.entries.get(key)
+        changed = previous['changed'] if previous and previous['hash'] == digest else self.build_date
+        self.entries[key] = {'hash': digest, 'changed': changed}
+        self.rendered += 1
+
+    def changed_on(self, output_path: Path) -> Optional[str]:
+        """Return the ISO date an output's inputs last changed, if it is known."""
+        entry = self.entries.get(self._key(output_path))
+        return entry['changed'] if entry else None
+
+    def prune(self, prefix: str, produced: Iterable[Path]) -> List[Path]:
+        """Delete outputs under prefix, and their .gz/.br siblings, that were not produced by this build."""
+        keep = {self._key(path) for path in produced}
+        removed = []
+        for key in list(self.entries):
+            if key.startswith(prefix) and key not in keep:
+                output_path = self.output_dir / key
+                output_path.unlink(missing_ok=True)
+                remove_variants(output_path)
+                del self.entries[key]
+                removed.append(output_path)
+        self.removed += len(removed)
+        return removed
@@ -0,0 +1,121 @@
+import csv
+import json
+import logging
+from functools import cached_property
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from location_index import LocationIndex, LocationKey, location_key
+from scraper.dedup import normalize_name
+from snapshot import SNAPSHOT_FILENAME, Snapshot, read_snapshot
+
+PHOTO_MAP_FILENAME = 'photo-variants.json'
+PHOTO_COLUMNS = [f'photo_{number}' for number in range(1, 9)]
+
+
+def photo_key(name: Optional[str], city: Optional[str], state: Optional[str]) -> Tuple[str, LocationKey]:
+    """Key that joins a magicians.csv row to a magician record: normalized name and location."""
+    return normalize_name(name), location_key(city, state)
+
+try:
+    import ijson
+except ImportError:  # streaming is optional
+    ijson = None
+
+
+class BuildData:
+    """Load-once view of the cities and magicians data shared by one build."""
+
+    def __init__(self, data_dir: Path, streaming: bool = False):
+        self.data_dir = Path(data_dir)
+        self.logger = logging.getLogger(__name__)
+        self.streaming = streaming
+        if streaming and ijson is None:
+            self.logger.warning("ijson is not installed, loading magicians.json in one piece")
+            self.streaming = False
+
+    def _load_json(self, filename: str) -> Dict:
+        with open(self.data_dir / filename, 'r') as f:
+            return json.load(f)
+
+    @cached_property
+    def cities(self) -> List[Dict]:
+        return self._load_json('cities.json')['cities']
+
+    @cached_property
+    def snapshot(self) -> Optional[Snapshot]:
+        """The magicians snapshot, if present and at least as new as magicians.json."""
+        snapshot_path = self.data_dir / SNAPSHOT_FILENAME
+        json_path = self.data_dir / 'magicians.json'
+        if not snapshot_path.exists():
+            return None
+        if json_path.exists() and json_path.stat().st_mtime > snapshot_path.stat().st_mtime:
+            self.logger.warning(f"{snapshot_path} is older than {json_path}, ignoring it")
+            return None
+        return read_snapshot(snapshot_path)
+
+    @cached_property
+    def magicians(self) -> List[Dict]:
+        if self.snapshot is not None:
+            return list(self.snapshot.iter_magicians())
+        return self._load_json('magicians.json')['magicians']
+
+    def iter_magicians(self) -> Iterator[Dict]:
+        """Yield magician records, streaming them from disk when enabled."""
+        if self.snapshot is not None and 'magicians' not in self.__dict__:
+            yield from self.snapshot.iter_magicians()
+            return
+        if not self.streaming or 'magicians' in self.__dict__:
+            yield from self.magicians
+            return
+        with open(self.data_dir / 'magicians.json', 'rb') as f:
+            yield from ijson.items(f, 'magicians.item', use_float=True)
+
+    @cached_property
+    def photo_variants(self) -> Dict[str, Dict[str, str]]:
+        """Remote photo URL -> {size: variant URL}, as written by photo ingestion."""
+        path = self.data_dir / PHOTO_MAP_FILENAME
+        if not path.exists():
+            return {}
+        with open(path, 'r') as f:
+            photos = json.load(f).get('photos', {})
+        return {url: entry['variants'] for url, entry in photos.items()}
+
+    @cached_property
+    def csv_photos(self) -> Dict[Tuple[str, LocationKey], List[str]]:
+        """photo_N URLs of each magicians.csv row, keyed by photo_key."""
+        path = self.data_dir / 'magicians.csv'
+        if not path.exists():
+            return {}
+        photos = {}
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                urls = [url for url in ((row.get(column) or '').strip() for column in PHOTO_COLUMNS) if url]
+                if urls:
+                    photos.setdefault(photo_key(row.get('name'), row.get('city'), row.get('state')), urls)
+        return photos
+
+    def with_photos(self, magicians: List[Dict]) -> List[Dict]:
+        """The records, with photos joined in from magicians.csv for those that have none.
+
+        Scraped records carry no photos of their own; the CSV rows that do are
+        matched by name and location. Records are copied, never modified.
+        """
+        if not self.csv_photos:
+            return magicians
+        joined = []
+        for magician in magicians:
+            if not magician.get('photos'):
+                location = magician.get('location') or {}
+                urls = self.csv_photos.get(photo_key(magician.get('name'), location.get('city'), location.get('state')))
+                if urls:
+                    magician = {**magician, 'photos': urls}
+            joined.append(magician)
+        return joined
+
+    @cached_property
+    def location_index(self) -> LocationIndex:
+        """Magicians grouped by city, taken from the snapshot or built from iter_magicians()."""
+        if self.snapshot is not None:
+            return self.snapshot.location_index(self.cities)
+        return LocationIndex(self.iter_magicians(), self.cities)
@@ -0,0 +1,72 @@
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+LocationKey = Tuple[str, str]
+
+
+def location_key(city: Optional[str], state: Optional[str]) -> LocationKey:
+    """Normalize a (city, state) pair into a case-folded lookup key."""
+    return (
+        ' '.join(str(city or '').split()).casefold(),
+        ' '.join(str(state or '').split()).casefold()
+    )
+
+
+class LocationIndex:
+    """Magicians grouped by normalized (city, state), built once per build."""
+
+    def __init__(self, magicians: Iterable[Dict], cities: Optional[Iterable[Dict]] = None):
+        start = time.perf_counter()
+        self._by_location: Dict[LocationKey, List[Dict]] = defaultdict(list)
+        self.magician_count = 0
+
+        for magician in magicians:
+            location = magician.get('location') or {}
+            key = location_key(location.get('city'), location.get('state'))
+            self._by_location[key].append(magician)
+            self.magician_count += 1
+
+        self.city_keys = None
+        if cities is not None:
+            self.city_keys = {location_key(c['name'], c['state']) for c in cities}
+
+        self.build_time = time.perf_counter() - start
+        self.lookups = 0
+        self.lookup_time = 0.0
+
+    def get(self, city: str, state: str) -> List[Dict]:
+        """Return the magicians located in the given city."""
+        start = time.perf_counter()
+        magicians = self._magicians_at(location_key(city, state))
+        self.lookup_time += time.perf_counter() - start
+        self.lookups += 1
+        return magicians
+
+    def _magicians_at(self, key: LocationKey) -> List[Dict]:
+        return self._by_location.get(key, [])
+
+    def unmatched(self) -> List[Dict]:
+        """Return magicians whose location matches none of the indexed cities."""
+        if self.city_keys is None:
+            return []
+        return [
+            magician
+            for key in list(self._by_location)
+            if key not in self.city_keys
+            for magician in self._magicians_at(key)
+        ]
+
+    def stats(self) -> Dict[str, float]:
+        """Return build and lookup counters for logging."""
+        return {
+            'magicians': self.magician_count,
+            'locations': len(self._by_location),
+            'unmatched': len(self.unmatched()),
+            'build_ms': self.build_time * 1000,
+            'lookups': self.lookups,
+            'lookup_ms': self.lookup_time * 1000
+        }
+
+    def __len__(self) -> int:
+        return len(self._by_location)
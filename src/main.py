@@ -1,21 +1,64 @@
+import argparse
 import logging
 from pathlib import Path
 import asyncio
-import json
-from datetime import datetime
-from typing import Dict, List
-import aiofiles
+from functools import partial
+from typing import Dict, Iterator, List
+from asset_pipeline import AssetPipeline
+from build_manifest import BuildManifest
+from data_context import PHOTO_MAP_FILENAME, BuildData
+from location_index import LocationIndex
+from output_writer import OutputWriter
 from page_generator import PageGenerator
+from precompress import Precompressor
+from render_pool import CityRenderPool
+from sitemap_writer import SitemapWriter
 from scraper.run_scraper import run_spider
+from utils.image_optimizer import ImageOptimizer
+from utils.photo_ingest import PhotoIngestor, photo_urls
 
 class MagicianWebsiteBuilder:
-    def __init__(self):
+    def __init__(
+        self,
+        incremental: bool = False,
+        workers: int = 1,
+        precompiled_templates: bool = False,
+        stream_json: bool = False,
+        gzip_sitemaps: bool = False,
+        writer_threads: int = 4,
+        precompress: bool = False,
+        minify: bool = False,
+        fingerprint_assets: bool = False,
+        incremental_crawl: bool = False,
+        crawl_max_requests: int = 0,
+        crawl_max_minutes: float = 0,
+        ingest_photos: bool = False
+    ):
         self.logger = self._setup_logging()
         self.base_dir = Path(__file__).resolve().parent.parent
         self.output_dir = self.base_dir / 'output'
         self.data_dir = self.base_dir / 'data'
         self.template_dir = self.base_dir / 'templates'
-        self.page_generator = PageGenerator(str(self.template_dir))
+        self.base_url = 'https://example.com'
+        self.assets = AssetPipeline(self.base_dir / 'static', minify=minify, fingerprint=fingerprint_assets)
+        self.static_assets = None
+        self.generator_options = {
+            'cache_dir': str(self.base_dir / '.cache' / 'jinja'),
+            'precompiled': precompiled_templates
+        }
+        if self.assets.enabled:
+            self.generator_options['page_filter'] = self.assets
+        self.data = BuildData(self.data_dir, streaming=stream_json)
+        self.page_generator = PageGenerator(str(self.template_dir), data=self.data, **self.generator_options)
+        self.manifest = BuildManifest(self.output_dir, incremental=incremental)
+        self.workers = workers
+        self.gzip_sitemaps = gzip_sitemaps
+        self.writer = OutputWriter(threads=writer_threads)
+        self.incremental_crawl = incremental_crawl
+        self.crawl_max_requests = crawl_max_requests
+        self.crawl_max_minutes = crawl_max_minutes
+        self.precompress = precompress
+        self.ingest_photos = ingest_photos
 
     def _setup_logging(self) -> logging.Logger:
         """Setup logging configuration."""
@@ -35,130 +78,225 @@ class MagicianWebsiteBuilder:
             directory.mkdir(exist_ok=True)
             self.logger.info(f"Ensured directory exists: {directory}")
 
-    async def _load_json_data(self, filepath: Path) -> Dict:
-        """Load JSON data from file."""
-        try:
-            async with aiofiles.open(filepath, 'r') as f:
-                content = await f.read()
-                return json.loads(content)
-        except Exception as e:
-            self.logger.error(f"Error loading {filepath}: {str(e)}")
-            raise
-
     async def generate_sitemap(self) -> str:
-        """Generate XML sitemap for all city pages."""
+        """Generate chunked XML sitemaps and a sitemap index for all pages."""
         self.logger.info("Generating sitemap...")
-        cities_data = await self._load_json_data(self.data_dir / 'cities.json')
-        
-        sitemap_path = self.output_dir / 'sitemap.xml'
-        urls = []
-        
-        for city in cities_data['cities']:
-            city_url = f"https://example.com/magicians/{city['name'].lower()}-{city['state'].lower()}.html"
-            urls.append({
-                'loc': city_url,
-                'lastmod': datetime.now().strftime('%Y-%m-%d'),
-                'changefreq': 'weekly',
-                'priority': '0.8'
-            })
+        writer = SitemapWriter(
+            self.output_dir,
+            self.base_url,
+            self.page_generator.get_template('sitemap.xml'),
+            self.page_generator.get_template('sitemap_index.xml'),
+            manifest=self.manifest,
+            gzip=self.gzip_sitemaps,
+            fingerprint=self.manifest.hash_inputs(
+                self.manifest.file_hash(self.template_dir / 'sitemap.xml'),
+                self.manifest.file_hash(self.template_dir / 'sitemap_index.xml')
+            )
+        )
+        index_path = writer.write(self._sitemap_entries())
+        self.manifest.prune('sitemap', writer.paths)
+
+        self.logger.info(
+            f"Sitemap index generated at {index_path}: {writer.written} files written, "
+            f"{writer.skipped} unchanged"
+        )
+        return str(index_path)
 
-        # Add other important pages
-        urls.append({
-            'loc': 'https://example.com/index.html',
-            'lastmod': datetime.now().strftime('%Y-%m-%d'),
+    def _sitemap_entries(self) -> Iterator[Dict]:
+        """Yield sitemap entries, dated by when each page's content last changed."""
+        index_path = self.output_dir / 'index.html'
+        yield {
+            'loc': f"{self.base_url}/index.html",
+            'lastmod': self.manifest.changed_on(index_path),
             'changefreq': 'daily',
             'priority': '1.0'
-        })
-
-        sitemap_content = self.page_generator.generate_sitemap(urls)
-        async with aiofiles.open(sitemap_path, 'w') as f:
-            await f.write(sitemap_content)
-
-        self.logger.info(f"Sitemap generated at {sitemap_path}")
-        return str(sitemap_path)
+        }
+        for city in self.data.cities:
+            page_path = self._city_page_path(city)
+            yield {
+                'loc': f"{self.base_url}/{page_path.relative_to(self.output_dir).as_posix()}",
+                'lastmod': self.manifest.changed_on(page_path),
+                'changefreq': 'weekly',
+                'priority': '0.8'
+            }
 
     async def generate_robots_txt(self):
         """Generate robots.txt file."""
         self.logger.info("Generating robots.txt...")
         robots_content = """User-agent: *
 Allow: /
-Sitemap: https://example.com/sitemap.xml"""
+Sitemap: https://example.com/sitemap_index.xml"""
 
         robots_path = self.output_dir / 'robots.txt'
-        async with aiofiles.open(robots_path, 'w') as f:
-            await f.write(robots_content)
+        digest = self.manifest.hash_inputs(robots_content)
+        if self.manifest.is_current(robots_path, digest):
+            return
+
+        await self.writer.write(robots_path, robots_content, partial(self.manifest.record, robots_path, digest))
 
         self.logger.info(f"robots.txt generated at {robots_path}")
 
+    async def ingest_remote_photos(self):
+        """Download magician photos into optimized variants in the build output and update the photo map."""
+        self.logger.info("Ingesting magician photos...")
+        # Variants are generated output, served from /static/images/photos like the copied assets
+        photos_dir = self.output_dir / 'static' / 'images' / 'photos'
+        optimizer = ImageOptimizer(str(photos_dir), str(photos_dir))
+        ingestor = PhotoIngestor(optimizer, self.data_dir / PHOTO_MAP_FILENAME)
+        await ingestor.ingest(photo_urls(self.data_dir / 'magicians.csv'))
+
+    def _page_photos(self, magicians: List[Dict]) -> Dict:
+        """The photo map entries a page renders, so a new photo elsewhere leaves the page alone."""
+        photo_variants = self.data.photo_variants
+        return {
+            url: photo_variants.get(url)
+            for magician in magicians
+            for url in magician.get('photos') or []
+        }
+
     async def generate_city_pages(self):
         """Generate individual pages for each city."""
         self.logger.info("Generating city pages...")
-        cities_data = await self._load_json_data(self.data_dir / 'cities.json')
-        magicians_data = await self._load_json_data(self.data_dir / 'magicians.json')
+        # Magicians are grouped by (city, state) once instead of scanning per city
+        location_index = self.data.location_index
+        template_hash = self.manifest.file_hash(self.template_dir / 'city_page.html')
+        produced = []
+        jobs = []
+        digests = {}
+
+        for city in self.data.cities:
+            page_path = self._city_page_path(city)
+            produced.append(page_path)
+            city_magicians = self.data.with_photos(location_index.get(city['name'], city['state']))
+
+            # Skip pages whose city, magicians, template and photo variants are unchanged
+            digest = self.manifest.hash_inputs(
+                city, city_magicians, template_hash, self.assets.cache_key(), self._page_photos(city_magicians)
+            )
+            if self.manifest.is_current(page_path, digest):
+                continue
+            digests[page_path] = digest
+            jobs.append((city, city_magicians))
 
-        for city in cities_data['cities']:
+        async for city, page_content, error in self._render_city_pages(jobs):
+            if error is not None:
+                self.logger.error(f"Error generating page for {city['name']}, {city['state']}: {error}")
+                continue
             try:
-                # Filter magicians for this city
-                city_magicians = [
-                    m for m in magicians_data['magicians']
-                    if m['location']['city'].lower() == city['name'].lower()
-                    and m['location']['state'].lower() == city['state'].lower()
-                ]
-
-                # Generate page content
-                page_content = self.page_generator.generate_city_page({
-                    'city': city,
-                    'magicians': city_magicians
-                })
-
-                # Save the page
-                page_path = self.output_dir / f"magicians/{city['name'].lower()}-{city['state'].lower()}.html"
-                page_path.parent.mkdir(exist_ok=True)
-                
-                async with aiofiles.open(page_path, 'w') as f:
-                    await f.write(page_content)
+                # Queue the page; the manifest is updated once it is on disk
+                page_path = self._city_page_path(city)
+                await self.writer.write(
+                    page_path,
+                    page_content,
+                    partial(self.manifest.record, page_path, digests[page_path])
+                )
 
                 self.logger.info(f"Generated page for {city['name']}, {city['state']}")
 
             except Exception as e:
                 self.logger.error(f"Error generating page for {city['name']}, {city['state']}: {str(e)}")
 
+        for page_path in self.manifest.prune('magicians/', produced):
+            self.logger.info(f"Removed page for deleted city: {page_path}")
+
+        self._log_location_index(location_index)
+
+    async def _render_city_pages(self, jobs: List):
+        """Render city pages serially, or across a process pool with --workers."""
+        if self.workers <= 1 or len(jobs) <= 1:
+            for city, city_magicians in jobs:
+                try:
+                    yield city, self.page_generator.generate_city_page(city, city_magicians), None
+                except Exception as e:
+                    yield city, None, str(e)
+            return
+
+        pool = CityRenderPool(
+            str(self.template_dir),
+            self.workers,
+            generator_options=self.generator_options
+        )
+        async for page in pool.render(jobs):
+            yield page
+        for pid, stats in sorted(pool.worker_stats.items()):
+            self.logger.info(
+                f"Render worker {pid}: {stats['pages']} pages in {stats['batches']} batches, "
+                f"{stats['render_seconds']:.2f}s rendering"
+            )
+
+    def _city_page_path(self, city: Dict) -> Path:
+        """Output path of a city's page."""
+        return self.output_dir / f"magicians/{city['name'].lower()}-{city['state'].lower()}.html"
+
+    def _log_location_index(self, location_index: LocationIndex):
+        """Log location index cost and magicians that matched no city."""
+        stats = location_index.stats()
+        self.logger.info(
+            f"Location index: {stats['magicians']} magicians in {stats['locations']} locations, "
+            f"built in {stats['build_ms']:.2f}ms, {stats['lookups']} lookups in {stats['lookup_ms']:.2f}ms"
+        )
+        for magician in location_index.unmatched():
+            location = magician.get('location') or {}
+            self.logger.warning(
+                f"Magician {magician.get('id')} ({magician.get('name')}) has no city page for "
+                f"{location.get('city')}, {location.get('state')}"
+            )
+
     async def generate_index_page(self):
         """Generate main index page."""
         self.logger.info("Generating index page...")
-        cities_data = await self._load_json_data(self.data_dir / 'cities.json')
+        index_path = self.output_dir / 'index.html'
+        digest = self.manifest.hash_inputs(
+            self.data.cities,
+            self.manifest.file_hash(self.template_dir / 'index.html'),
+            self.assets.cache_key()
+        )
+        if self.manifest.is_current(index_path, digest):
+            self.logger.info("Index page unchanged, skipping")
+            return
         
         index_content = self.page_generator.generate_index_page({
-            'cities': cities_data['cities']
+            'cities': self.data.cities
         })
         
-        index_path = self.output_dir / 'index.html'
-        async with aiofiles.open(index_path, 'w') as f:
-            await f.write(index_content)
+        await self.writer.write(index_path, index_content, partial(self.manifest.record, index_path, digest))
 
         self.logger.info("Index page generated")
 
+    def _process_static_assets(self):
+        """Minify and fingerprint static assets; pages need the asset map before rendering."""
+        if self.static_assets is None:
+            self.static_assets = self.assets.process(['css', 'js', 'images'])
+
     async def copy_static_assets(self):
         """Copy static assets to output directory."""
         self.logger.info("Copying static assets...")
-        static_dir = self.base_dir / 'static'
         output_static = self.output_dir / 'static'
-        output_static.mkdir(exist_ok=True)
+        self._process_static_assets()
 
         # Copy CSS, JS, and images
-        for asset_type in ['css', 'js', 'images']:
-            src_dir = static_dir / asset_type
-            dst_dir = output_static / asset_type
-            if src_dir.exists():
-                dst_dir.mkdir(exist_ok=True)
-                for file in src_dir.glob('**/*'):
-                    if file.is_file():
-                        dst_file = dst_dir / file.relative_to(src_dir)
-                        dst_file.parent.mkdir(exist_ok=True)
-                        dst_file.write_bytes(file.read_bytes())
+        copied = []
+        for file, relative_path, content in self.static_assets:
+            dst_file = output_static / relative_path
+            copied.append(dst_file)
+            digest = self.manifest.hash_inputs(self.manifest.file_hash(file), self.assets.minify)
+            if self.manifest.is_current(dst_file, digest):
+                continue
+            await self.writer.write(dst_file, content, partial(self.manifest.record, dst_file, digest))
+
+        self.manifest.prune('static/', copied)
 
         self.logger.info("Static assets copied")
 
+    def _log_writer_stats(self):
+        """Log output writer throughput and latency."""
+        stats = self.writer.stats()
+        self.logger.info(
+            f"Output writer: {stats['files_written']} files ({stats['bytes_written']} bytes) written, "
+            f"{stats['files_skipped']} identical skipped, {stats['errors']} errors, latency "
+            f"p50 {stats['p50_ms']:.2f}ms / p90 {stats['p90_ms']:.2f}ms / p99 {stats['p99_ms']:.2f}ms"
+        )
+
     async def build_website(self):
         """Main method to build the entire website."""
         try:
@@ -169,23 +307,116 @@ Sitemap: https://example.com/sitemap.xml"""
             
             # Run scraper to update data
             self.logger.info("Running scraper to update magician data...")
-            run_spider()
+            run_spider(
+                incremental=self.incremental_crawl,
+                max_requests=self.crawl_max_requests,
+                max_seconds=self.crawl_max_minutes * 60
+            )
             
+            # Pages look photos up in the photo map, so ingest before rendering
+            if self.ingest_photos:
+                await self.ingest_remote_photos()
+
             # Generate all pages and assets
+            self._process_static_assets()
             await asyncio.gather(
                 self.generate_city_pages(),
                 self.generate_index_page(),
-                self.generate_sitemap(),
                 self.generate_robots_txt(),
                 self.copy_static_assets()
             )
+
+            # The sitemap dates each page by when it last changed, so it goes last
+            await self.writer.flush()
+            await self.generate_sitemap()
+            await self.writer.close()
+            self.manifest.save()
+
+            # Compress once at build time so nginx can serve with gzip_static
+            if self.precompress:
+                Precompressor(self.output_dir).run()
+            self._log_writer_stats()
             
-            self.logger.info("Website build completed successfully!")
+            self.logger.info(
+                f"Website build completed successfully! {self.manifest.rendered} outputs written, "
+                f"{self.manifest.skipped} unchanged, {self.manifest.removed} removed"
+            )
             
         except Exception as e:
             self.logger.error(f"Error building website: {str(e)}")
             raise
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Build the magician directory website.')
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help='only rebuild outputs whose inputs changed since the last build'
+    )
+    parser.add_argument(
+        '--workers', type=int, default=1, metavar='N',
+        help='render city pages across N worker processes'
+    )
+    parser.add_argument(
+        '--precompiled-templates', action='store_true',
+        help='compile templates ahead of time into a cached module archive'
+    )
+    parser.add_argument(
+        '--stream-json', action='store_true',
+        help='stream magicians.json record by record instead of loading it whole (needs ijson)'
+    )
+    parser.add_argument(
+        '--gzip-sitemaps', action='store_true',
+        help='write sitemap chunks as sitemap-N.xml.gz'
+    )
+    parser.add_argument(
+        '--writer-threads', type=int, default=4, metavar='N',
+        help='number of threads writing build output'
+    )
+    parser.add_argument(
+        '--precompress', action='store_true',
+        help='write .gz (and .br with brotli installed) siblings of HTML/XML/CSS/JS output'
+    )
+    parser.add_argument(
+        '--minify', action='store_true',
+        help='minify rendered HTML and static CSS/JS'
+    )
+    parser.add_argument(
+        '--fingerprint-assets', action='store_true',
+        help='add content hashes to static asset filenames and rewrite page references'
+    )
+    parser.add_argument(
+        '--incremental-crawl', action='store_true',
+        help='only re-request profiles that are due, with conditional requests'
+    )
+    parser.add_argument(
+        '--crawl-max-requests', type=int, default=0, metavar='N',
+        help='stop the crawl after N responses, most valuable profiles first'
+    )
+    parser.add_argument(
+        '--crawl-max-minutes', type=float, default=0, metavar='M',
+        help='stop the crawl after M minutes, most valuable profiles first'
+    )
+    parser.add_argument(
+        '--ingest-photos', action='store_true',
+        help='download photo_N URLs from magicians.csv into optimized WebP variants (needs aiohttp)'
+    )
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    builder = MagicianWebsiteBuilder()
+    args = parse_args()
+    builder = MagicianWebsiteBuilder(
+        incremental=args.incremental,
+        workers=args.workers,
+        precompiled_templates=args.precompiled_templates,
+        stream_json=args.stream_json,
+        gzip_sitemaps=args.gzip_sitemaps,
+        writer_threads=args.writer_threads,
+        precompress=args.precompress,
+        minify=args.minify,
+        fingerprint_assets=args.fingerprint_assets,
+        incremental_crawl=args.incremental_crawl,
+        crawl_max_requests=args.crawl_max_requests,
+        crawl_max_minutes=args.crawl_max_minutes,
+        ingest_photos=args.ingest_photos
+    )
     asyncio.run(builder.build_website())
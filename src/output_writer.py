@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Union
+
+from precompress import remove_variants
+
+
+class OutputWriter:
+    """Bounded queue of file writes drained by a pool of writer threads.
+
+    Files are written to a temp file and renamed into place, and writes whose
+    bytes match the file already on disk are skipped. A rewritten file loses
+    its precompressed siblings, which --precompress recreates.
+    """
+
+    def __init__(self, threads: int = 4, queue_size: int = 256):
+        self.threads = max(1, threads)
+        self.queue_size = queue_size
+        self.logger = logging.getLogger(__name__)
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumers: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._created_dirs: Set[Path] = set()
+        self._lock = threading.Lock()
+        self.files_written = 0
+        self.files_skipped = 0
+        self.bytes_written = 0
+        self.errors = 0
+        self.latencies: List[float] = []
+
+    def _start(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='output-writer')
+        self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.threads)]
+
+    async def write(
+        self,
+        path: Path,
+        content: Union[str, bytes],
+        on_written: Optional[Callable[[], None]] = None
+    ):
+        """Queue a write, waiting while the queue is full.
+
+        on_written runs on the event loop once the file is on disk (or already
+        identical), so callers can record the output only after it succeeded.
+        """
+        if self._queue is None:
+            self._start()
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        await self._queue.put((Path(path), data, on_written))
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            path, data, on_written = await self._queue.get()
+            try:
+                await loop.run_in_executor(self._executor, self._write_file, path, data)
+                if on_written is not None:
+                    on_written()
+            except Exception as e:
+                self.errors += 1
+                self.logger.error(f"Error writing {path}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _write_file(self, path: Path, data: bytes):
+        start = time.perf_counter()
+        written = False
+        if not self._is_identical(path, data):
+            self._ensure_dir(path.parent)
+            tmp_path = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            remove_variants(path)
+            written = True
+
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.latencies.append(elapsed)
+            if written:
+                self.files_written += 1
+                self.bytes_written += len(data)
+            else:
+                self.files_skipped += 1
+
+    @staticmethod
+    def _is_identical(path: Path, data: bytes) -> bool:
+        try:
+            if path.stat().st_size != len(data):
+                return False
+            with open(path, 'rb') as f:
+                return f.read() == data
+        except FileNotFoundError:
+            return False
+
+    def _ensure_dir(self, directory: Path):
+        if directory in self._created_dirs:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._created_dirs.add(directory)
+
+    async def flush(self):
+        """Wait until every queued write has finished."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self):
+        """Flush pending writes and stop the writer threads."""
+        if self._queue is None:
+            return
+        await self.flush()
+        for consumer in self._consumers:
+            consumer.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._executor.shutdown()
+        self._queue = None
+        self._consumers = []
+
+    def percentile(self, pct: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'files_written': self.files_written,
+            'files_skipped': self.files_skipped,
+            'bytes_written': self.bytes_written,
+            'errors': self.errors,
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99)
+        }
@@ -1,51 +1,123 @@
-import json
+import hashlib
 from pathlib import Path
-from jinja2 import Environment, FileSystemLoader
-from typing import Dict, List
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, ModuleLoader, Template
+from typing import Callable, Dict, List, Optional
+from build_manifest import BuildManifest
+from data_context import BuildData
+from sitemap_writer import SitemapWriter
 
 class PageGenerator:
-    def __init__(self, template_dir: str = "templates"):
+    def __init__(
+        self,
+        template_dir: str = "templates",
+        data: Optional[BuildData] = None,
+        cache_dir: Optional[str] = None,
+        precompiled: bool = False,
+        page_filter: Optional[Callable[[str], str]] = None
+    ):
         self.base_dir = Path(__file__).resolve().parent.parent
         self.template_dir = self.base_dir / template_dir
         self.data_dir = self.base_dir / 'data'
-        self.env = Environment(loader=FileSystemLoader(str(self.template_dir)))
-        self.cities = self._load_json("cities.json")
-        self.magicians = self._load_json("magicians.json")
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        # Data is loaded lazily, so render workers that never touch it pay nothing
+        self.data = data if data is not None else BuildData(self.data_dir)
+        self.env = self._create_environment(precompiled)
+        self._templates: Dict[str, Template] = {}
+        # Applied to every rendered page, e.g. asset URL rewriting and minification
+        self.page_filter = page_filter
+
+    def _new_environment(self, loader, **options) -> Environment:
+        """Build a Jinja environment with the site's filters registered.
+
+        Templates are checked for unknown filters when they compile, so every
+        environment, including the one compile_templates uses, needs them.
+        """
+        env = Environment(loader=loader, **options)
+        env.filters['photo_variant'] = self.photo_variant
+        return env
+
+    def _create_environment(self, precompiled: bool) -> Environment:
+        """Create the Jinja environment, backed by the on-disk caches when configured."""
+        loader = FileSystemLoader(str(self.template_dir))
+        if self.cache_dir is None:
+            return self._new_environment(loader)
+
+        # Bytecode is keyed by template name and validated against the source checksum
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        env = self._new_environment(
+            loader,
+            bytecode_cache=FileSystemBytecodeCache(str(self.cache_dir)),
+            auto_reload=False
+        )
+        if not precompiled:
+            return env
+        return self._new_environment(ModuleLoader(self.compile_templates(env)), auto_reload=False)
+
+    def templates_hash(self) -> str:
+        """Hash the names and contents of every file in the template directory."""
+        digest = hashlib.sha256()
+        for path in sorted(self.template_dir.rglob('*')):
+            if path.is_file():
+                digest.update(path.relative_to(self.template_dir).as_posix().encode('utf-8'))
+                digest.update(path.read_bytes())
+        return digest.hexdigest()
+
+    def compile_templates(self, env: Optional[Environment] = None) -> str:
+        """Compile all templates ahead of time into a module archive keyed by their hash."""
+        if self.cache_dir is None:
+            raise ValueError("Template precompilation requires a cache_dir")
+        target = self.cache_dir / f"templates-{self.templates_hash()[:16]}.zip"
+        if not target.exists():
+            tmp_target = target.with_suffix('.tmp')
+            (env or self.env).compile_templates(str(tmp_target), zip='deflated', ignore_errors=False)
+            tmp_target.replace(target)
+        return str(target)
+
+    def photo_variant(self, url: Optional[str], size: str = 'medium') -> Optional[str]:
+        """Template filter: the local optimized variant of a remote photo, else the URL itself."""
+        if not url:
+            return url
+        return self.data.photo_variants.get(url, {}).get(size, url)
+
+    def get_template(self, name: str) -> Template:
+        """Resolve a template once per process."""
+        if name not in self._templates:
+            self._templates[name] = self.env.get_template(name)
+        return self._templates[name]
         
-    def _load_json(self, filename: str) -> Dict:
-        file_path = self.data_dir / filename
-        if file_path.exists():
-            with open(file_path, 'r') as f:
-                return json.load(f)
-        return {}
             
-    def generate_city_page(self, city: Dict) -> str:
+    def generate_city_page(self, city: Dict, magicians: Optional[List[Dict]] = None) -> str:
         """Generate HTML content for a specific city."""
-        template = self.env.get_template("city_page.html")
-        local_magicians = self._get_magicians_in_city(city["name"], city["state"])
+        template = self.get_template("city_page.html")
+        if magicians is None:
+            magicians = self.data.with_photos(self._get_magicians_in_city(city["name"], city["state"]))
         
-        return template.render(
+        return self._finish(template.render(
             city=city,
-            magicians=local_magicians,
+            magicians=magicians,
             meta_title=f"Magicians in {city['name']}, {city['state']} - Book Local Magic Shows",
             meta_description=f"Find and book professional magicians in {city['name']}, {city['state']}. "
                            f"View profiles, read reviews, and contact magicians for your next event."
-        )
+        ))
         
+    def generate_index_page(self, data: Dict) -> str:
+        """Generate HTML content for the index page."""
+        template = self.get_template("index.html")
+        return self._finish(template.render(**data))
+
+    def _finish(self, html: str) -> str:
+        return self.page_filter(html) if self.page_filter is not None else html
+
     def _get_magicians_in_city(self, city: str, state: str) -> List[Dict]:
         """Filter magicians by city and state."""
-        return [
-            magician for magician in self.magicians["magicians"]
-            if magician["location"]["city"].lower() == city.lower() 
-            and magician["location"]["state"].lower() == state.lower()
-        ]
+        return self.data.location_index.get(city, state)
         
     def generate_all_pages(self, output_dir: str = "output"):
         """Generate pages for all cities."""
         output_path = Path(output_dir)
         output_path.mkdir(exist_ok=True)
         
-        for city in self.cities["cities"]:
+        for city in self.data.cities:
             city_html = self.generate_city_page(city)
             city_path = output_path / f"{city['name'].lower()}-{city['state'].lower()}.html"
             
@@ -53,22 +125,25 @@ class PageGenerator:
                 f.write(city_html)
                 
     def generate_sitemap(self, base_url: str, output_dir: str = "output") -> str:
-        """Generate XML sitemap for all city pages."""
-        template = self.env.get_template("sitemap.xml")
-        urls = []
-        
-        for city in self.cities["cities"]:
-            urls.append({
-                "loc": f"{base_url}/{city['name'].lower()}-{city['state'].lower()}.html",
-                "lastmod": "2024-01-01",  # This should be dynamic in production
-                "changefreq": "weekly",
-                "priority": "0.8"
-            })
-            
-        sitemap_content = template.render(urls=urls)
-        sitemap_path = Path(output_dir) / "sitemap.xml"
-        
-        with open(sitemap_path, 'w') as f:
-            f.write(sitemap_content)
-            
-        return str(sitemap_path)
+        """Generate chunked XML sitemaps for all city pages, dated by when their content last changed."""
+        output_path = Path(output_dir)
+        # File mtimes move whenever a page is rewritten; the build manifest knows when its inputs changed
+        manifest = BuildManifest(output_path)
+
+        def entries():
+            for city in self.data.cities:
+                page_name = f"{city['name'].lower()}-{city['state'].lower()}.html"
+                yield {
+                    "loc": f"{base_url}/{page_name}",
+                    "lastmod": manifest.changed_on(output_path / page_name),
+                    "changefreq": "weekly",
+                    "priority": "0.8"
+                }
+
+        writer = SitemapWriter(
+            output_path,
+            base_url,
+            self.get_template("sitemap.xml"),
+            self.get_template("sitemap_index.xml")
+        )
+        return str(writer.write(entries()))
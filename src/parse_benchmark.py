@@ -0,0 +1,277 @@
+import argparse
+import gzip
+import json
+import logging
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from scrapy import Request
+from scrapy.http import HtmlResponse
+from scrapy.http.headers import Headers
+from scrapy.utils.test import get_crawler
+from w3lib.http import headers_raw_to_dict
+
+from scraper.middlewares import DataCleaningMiddleware
+from scraper.pipelines import MagicianPipeline
+from scraper.spiders.magician_spider import MagicianSpider
+
+try:
+    import brotli
+except ImportError:  # only needed for br-encoded cache entries
+    brotli = None
+
+# Fields that differ on every run and are left out of golden comparisons
+VOLATILE_FIELDS = ('last_updated',)
+
+
+def _decompress(body: bytes, encoding: str) -> bytes:
+    if encoding in ('gzip', 'x-gzip'):
+        return gzip.decompress(body)
+    if encoding == 'deflate':
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            # Some servers send raw deflate without the zlib header
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    if encoding == 'br':
+        if brotli is None:
+            raise RuntimeError("brotli is required to read br-encoded cache entries")
+        return brotli.decompress(body)
+    if encoding == 'identity':
+        return body
+    raise ValueError(f"unsupported Content-Encoding {encoding!r}")
+
+
+def decode_body(body: bytes, headers: Headers) -> bytes:
+    """Undo the Content-Encoding of a cached body, as HttpCompressionMiddleware would.
+
+    HttpCacheMiddleware stores bodies before decompression, so a cached
+    gzip or br page is still compressed on disk.
+    """
+    encodings = b','.join(headers.getlist('Content-Encoding')).decode('latin-1')
+    # Codings are listed in the order they were applied, so undo them last to first
+    for encoding in reversed([value.strip().lower() for value in encodings.split(',') if value.strip()]):
+        body = _decompress(body, encoding)
+    return body
+
+
+class FixtureStore:
+    """Recorded responses keyed by URL, from a fixture directory or Scrapy's httpcache.
+
+    A fixture directory holds an index.json mapping each URL to
+    {"file": <path relative to the directory>, "status": 200}.
+    """
+
+    def __init__(self, pages: Dict[str, Tuple[int, bytes]]):
+        self.pages = pages
+
+    @classmethod
+    def from_directory(cls, directory: Path) -> 'FixtureStore':
+        directory = Path(directory)
+        with open(directory / 'index.json', 'r') as f:
+            index = json.load(f)
+        pages = {
+            url: (entry.get('status', 200), (directory / entry['file']).read_bytes())
+            for url, entry in index.items()
+        }
+        return cls(pages)
+
+    @classmethod
+    def from_httpcache(cls, cache_dir: Path) -> 'FixtureStore':
+        """Load the filesystem cache storage, httpcache/<spider>/<fp[:2]>/<fp>/.
+
+        Bodies are decoded per their cached Content-Encoding.
+        """
+        pages = {}
+        for meta_path in Path(cache_dir).glob('*/*/pickled_meta'):
+            with open(meta_path, 'rb') as f:
+                meta = pickle.load(f)
+            entry_dir = meta_path.parent
+            headers = Headers(headers_raw_to_dict((entry_dir / 'response_headers').read_bytes()))
+            body = decode_body((entry_dir / 'response_body').read_bytes(), headers)
+            pages[meta['url']] = (meta['status'], body)
+        return cls(pages)
+
+    def response_for(self, request: Request) -> Optional[HtmlResponse]:
+        page = self.pages.get(request.url)
+        if page is None:
+            return None
+        status, body = page
+        return HtmlResponse(request.url, status=status, body=body, encoding='utf-8', request=request)
+
+
+class ParseBenchmark:
+    """Replay recorded pages through the spider, DataCleaningMiddleware and MagicianPipeline offline."""
+
+    def __init__(self, store: FixtureStore):
+        self.store = store
+        self.logger = logging.getLogger(__name__)
+
+    def run(self) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Crawl the fixtures once from the spider's start requests; return items and stats."""
+        crawler = get_crawler(MagicianSpider, {'LOG_ENABLED': False})
+        spider = MagicianSpider.from_crawler(crawler)
+        # Start from an empty dataset so results do not depend on data/ or a leftover item log
+        spider.existing_magicians = {'magicians': []}
+        spider.completed_ids = set()
+        cleaner = DataCleaningMiddleware()
+
+        cpu: Dict[str, float] = defaultdict(float)
+        pages, missing = 0, 0
+        items: List[Dict[str, Any]] = []
+        with tempfile.TemporaryDirectory() as data_dir:
+            pipeline = MagicianPipeline(data_dir=Path(data_dir))
+            pipeline.open_spider(spider)
+            queue = deque(spider.start_requests())
+            started = time.perf_counter()
+            while queue:
+                request = queue.popleft()
+                response = self.store.response_for(request)
+                if response is None:
+                    missing += 1
+                    continue
+                pages += 1
+
+                callback_name = request.callback.__name__
+                clock = time.process_time()
+                output = list(request.callback(response))
+                cpu[callback_name] += time.process_time() - clock
+
+                clock = time.process_time()
+                output = list(cleaner.process_spider_output(response, output, spider))
+                cpu['DataCleaningMiddleware'] += time.process_time() - clock
+
+                for result in output:
+                    if isinstance(result, Request):
+                        queue.append(result)
+                        continue
+                    clock = time.process_time()
+                    items.append(pipeline.process_item(result, spider))
+                    cpu['MagicianPipeline'] += time.process_time() - clock
+            elapsed = time.perf_counter() - started
+            pipeline.item_log.remove()
+
+        stats = {
+            'pages': pages,
+            'missing_pages': missing,
+            'items': len(items),
+            'seconds': elapsed,
+            'pages_per_sec': pages / elapsed if elapsed else 0.0,
+            'items_per_sec': len(items) / elapsed if elapsed else 0.0,
+            'cpu_ms': {name: seconds * 1000 for name, seconds in sorted(cpu.items())}
+        }
+        return items, stats
+
+    def peak_memory(self) -> int:
+        """Peak bytes allocated during one replay, measured apart from the timed runs."""
+        tracemalloc.start()
+        try:
+            self.run()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+
+def _comparable(items: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    return {
+        item['id']: {key: value for key, value in item.items() if key not in VOLATILE_FIELDS}
+        for item in items
+    }
+
+
+def diff_golden(items: List[Dict[str, Any]], golden: List[Dict[str, Any]]) -> List[str]:
+    """Describe every difference between extracted items and the golden output."""
+    actual, expected = _comparable(items), _comparable(golden)
+    differences = [f"missing item {item_id}" for item_id in sorted(expected.keys() - actual.keys())]
+    differences += [f"unexpected item {item_id}" for item_id in sorted(actual.keys() - expected.keys())]
+    for item_id in sorted(actual.keys() & expected.keys()):
+        for key in sorted(actual[item_id].keys() | expected[item_id].keys()):
+            if actual[item_id].get(key) != expected[item_id].get(key):
+                differences.append(
+                    f"{item_id}.{key}: expected {expected[item_id].get(key)!r}, got {actual[item_id].get(key)!r}"
+                )
+    return differences
+
+
+def check_baseline(stats: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Report throughput or CPU time that regressed by more than tolerance against a saved run."""
+    regressions = []
+    if stats['pages_per_sec'] < baseline['pages_per_sec'] * (1 - tolerance):
+        regressions.append(
+            f"pages/sec {stats['pages_per_sec']:.1f} is below baseline {baseline['pages_per_sec']:.1f}"
+        )
+    for name, baseline_ms in baseline.get('cpu_ms', {}).items():
+        current_ms = stats['cpu_ms'].get(name, 0.0)
+        if current_ms > baseline_ms * (1 + tolerance):
+            regressions.append(f"{name} CPU {current_ms:.1f} ms is above baseline {baseline_ms:.1f} ms")
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark and regression-check spider parsing offline.')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--fixtures', type=Path, help='fixture directory with an index.json')
+    source.add_argument('--httpcache', type=Path, help="Scrapy httpcache directory for the spider, e.g. .scrapy/httpcache/magician_spider")
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs; the fastest is reported')
+    parser.add_argument('--golden', type=Path, help='JSON list of expected items to diff against')
+    parser.add_argument('--update-golden', action='store_true', help='write the extracted items to --golden')
+    parser.add_argument('--baseline', type=Path, help='stats JSON of an earlier run to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='write this run\'s stats to --baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown against the baseline')
+    return parser.parse_args()
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    logging.getLogger('scrapy').setLevel(logging.WARNING)
+    logger = logging.getLogger(__name__)
+    args = parse_args()
+
+    store = FixtureStore.from_directory(args.fixtures) if args.fixtures else FixtureStore.from_httpcache(args.httpcache)
+    benchmark = ParseBenchmark(store)
+    runs = [benchmark.run() for _ in range(max(1, args.repeat))]
+    items, stats = min(runs, key=lambda run: run[1]['seconds'])
+    stats['peak_memory_bytes'] = benchmark.peak_memory()
+
+    logger.info(
+        f"{stats['pages']} pages, {stats['items']} items in {stats['seconds'] * 1000:.1f} ms "
+        f"({stats['pages_per_sec']:.1f} pages/sec, {stats['items_per_sec']:.1f} items/sec), "
+        f"peak memory {stats['peak_memory_bytes'] / 1024:.0f} KiB, {stats['missing_pages']} requests not recorded"
+    )
+    for name, ms in stats['cpu_ms'].items():
+        logger.info(f"  {name}: {ms:.1f} ms CPU")
+
+    failed = False
+    if args.golden and args.update_golden:
+        with open(args.golden, 'w') as f:
+            json.dump(list(_comparable(items).values()), f, indent=2, sort_keys=True, default=str)
+        logger.info(f"Wrote {len(items)} golden items to {args.golden}")
+    elif args.golden:
+        with open(args.golden, 'r') as f:
+            differences = diff_golden(items, json.load(f))
+        for difference in differences:
+            logger.error(difference)
+        failed = failed or bool(differences)
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(stats, f, indent=2, sort_keys=True)
+    elif args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = check_baseline(stats, json.load(f), args.tolerance)
+        for regression in regressions:
+            logger.error(regression)
+        failed = failed or bool(regressions)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
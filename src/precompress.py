@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # .br variants are optional
+    brotli = None
+
+COMPRESSIBLE_SUFFIXES = ('.html', '.xml', '.css', '.js')
+VARIANT_SUFFIXES = ('.gz', '.br')
+
+
+def remove_variants(path: Path) -> int:
+    """Delete the .gz/.br siblings of an output that was rewritten or removed.
+
+    nginx gzip_static serves a sibling whenever it exists, so one left behind
+    keeps serving the old page. Returns how many were deleted.
+    """
+    removed = 0
+    for suffix in VARIANT_SUFFIXES:
+        variant = path.with_name(path.name + suffix)
+        if variant.exists():
+            variant.unlink()
+            removed += 1
+    return removed
+
+
+def _write_variant(path: Path, data: bytes):
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _compress_file(path: str, previous_hash: Optional[str], use_brotli: bool) -> Tuple[str, str, bool, int, int]:
+    """Write .gz/.br siblings for one file unless its content hash is unchanged.
+
+    Returns (path, content hash, compressed, source bytes, variant bytes).
+    """
+    source = Path(path)
+    data = source.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    variants = [(source.with_name(source.name + '.gz'), lambda: gzip.compress(data, 9, mtime=0))]
+    if use_brotli:
+        variants.append((source.with_name(source.name + '.br'), lambda: brotli.compress(data, quality=11)))
+
+    if digest == previous_hash and all(variant.exists() for variant, _ in variants):
+        return path, digest, False, len(data), 0
+
+    variant_bytes = 0
+    for variant, compress in variants:
+        compressed = compress()
+        # A variant that is not smaller than the source is never worth serving
+        if len(compressed) < len(data):
+            _write_variant(variant, compressed)
+            variant_bytes += len(compressed)
+        else:
+            variant.unlink(missing_ok=True)
+    return path, digest, True, len(data), variant_bytes
+
+
+class Precompressor:
+    """Build-time .gz/.br siblings of text outputs for nginx gzip_static."""
+
+    def __init__(self, output_dir: Path, min_size: int = 1024, workers: Optional[int] = None):
+        self.output_dir = Path(output_dir)
+        self.manifest_path = self.output_dir / '.precompress-manifest.json'
+        self.min_size = min_size
+        self.workers = workers
+        self.logger = logging.getLogger(__name__)
+        self.use_brotli = brotli is not None
+
+    def _load_manifest(self) -> Dict[str, str]:
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _candidates(self) -> List[Path]:
+        return [
+            path for path in self.output_dir.rglob('*')
+            if path.suffix in COMPRESSIBLE_SUFFIXES
+            and path.is_file()
+            and path.stat().st_size >= self.min_size
+        ]
+
+    def run(self) -> Dict[str, int]:
+        """Compress every eligible output whose content changed since the last run."""
+        previous = self._load_manifest()
+        candidates = self._candidates()
+        hashes: Dict[str, str] = {}
+        stats = {'files': len(candidates), 'compressed': 0, 'unchanged': 0, 'removed': 0,
+                 'source_bytes': 0, 'variant_bytes': 0}
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            keys = [path.relative_to(self.output_dir).as_posix() for path in candidates]
+            results = executor.map(
+                _compress_file,
+                [str(path) for path in candidates],
+                [previous.get(key) for key in keys],
+                [self.use_brotli] * len(candidates),
+                chunksize=64
+            )
+            for key, (path, digest, compressed, source_bytes, variant_bytes) in zip(keys, results):
+                hashes[key] = digest
+                if compressed:
+                    stats['compressed'] += 1
+                    stats['source_bytes'] += source_bytes
+                    stats['variant_bytes'] += variant_bytes
+                else:
+                    stats['unchanged'] += 1
+
+        # Drop variants whose source was deleted or fell below the threshold
+        for key in set(previous) - set(hashes):
+            stats['removed'] += remove_variants(self.output_dir / key)
+
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(hashes, f, indent=2, sort_keys=True)
+        tmp_path.replace(self.manifest_path)
+
+        self.logger.info(
+            f"Precompressed {stats['compressed']} of {stats['files']} files "
+            f"({stats['source_bytes']} -> {stats['variant_bytes']} bytes across variants, "
+            f"brotli {'on' if self.use_brotli else 'off'}), {stats['unchanged']} unchanged, "
+            f"{stats['removed']} stale variants removed"
+        )
+        return stats
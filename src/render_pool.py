@@ -0,0 +1,79 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from page_generator import PageGenerator
+
+# (city, magicians) pairs sent to a worker, and (city, html) pairs sent back
+CityJob = Tuple[Dict, List[Dict]]
+RenderedPage = Tuple[Dict, Optional[str], Optional[str]]
+
+_generator: Optional[PageGenerator] = None
+
+
+def _init_worker(template_dir: str, generator_options: Dict):
+    """Create the per-process PageGenerator and resolve the city template once."""
+    global _generator
+    _generator = PageGenerator(template_dir, **generator_options)
+    _generator.get_template("city_page.html")
+
+
+def _render_batch(batch: List[CityJob]) -> Tuple[List[RenderedPage], Dict]:
+    """Render a batch of city pages inside a worker process."""
+    start = time.perf_counter()
+    pages = []
+    for city, magicians in batch:
+        try:
+            pages.append((city, _generator.generate_city_page(city, magicians), None))
+        except Exception as e:
+            pages.append((city, None, str(e)))
+    stats = {
+        'pid': os.getpid(),
+        'pages': len(batch),
+        'render_seconds': time.perf_counter() - start
+    }
+    return pages, stats
+
+
+class CityRenderPool:
+    """Process pool that renders city pages in batches; the caller does the I/O."""
+
+    def __init__(
+        self,
+        template_dir: str,
+        workers: int,
+        batch_size: int = 64,
+        generator_options: Optional[Dict] = None
+    ):
+        self.template_dir = template_dir
+        self.generator_options = generator_options or {}
+        self.workers = workers
+        self.batch_size = batch_size
+        self.worker_stats: Dict[int, Dict[str, float]] = {}
+
+    async def render(self, jobs: List[CityJob]) -> AsyncIterator[RenderedPage]:
+        """Yield rendered pages as their batches complete."""
+        loop = asyncio.get_running_loop()
+        # Keep batches small enough that every worker gets several of them
+        batch_size = max(1, min(self.batch_size, -(-len(jobs) // (self.workers * 4))))
+        batches = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.template_dir, self.generator_options)
+        ) as executor:
+            futures = [loop.run_in_executor(executor, _render_batch, batch) for batch in batches]
+            for future in asyncio.as_completed(futures):
+                pages, stats = await future
+                self._record(stats)
+                for page in pages:
+                    yield page
+
+    def _record(self, stats: Dict):
+        totals = self.worker_stats.setdefault(stats['pid'], {'batches': 0, 'pages': 0, 'render_seconds': 0.0})
+        totals['batches'] += 1
+        totals['pages'] += stats['pages']
+        totals['render_seconds'] += stats['render_seconds']
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Markup that changes on every request (CSRF tokens, analytics) without the profile changing
+_VOLATILE_MARKUP = re.compile(rb'<script\b.*?</script\s*>|<!--.*?-->|\s+', re.S | re.I)
+
+DAY = 86400
+
+
+def page_fingerprint(body: bytes) -> str:
+    """Hash of a page body with scripts, comments and whitespace stripped."""
+    return hashlib.sha256(_VOLATILE_MARKUP.sub(b'', body)).hexdigest()
+
+
+class CrawlState:
+    """Per-profile-URL validators, fingerprints and change history for incremental crawls.
+
+    A profile is due again after an interval that grows while it keeps coming
+    back unchanged and shrinks once it changes.
+    """
+
+    VERSION = 1
+    BASE_INTERVAL = DAY
+    MIN_INTERVAL = DAY / 2
+    MAX_INTERVAL = 30 * DAY
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.logger = logging.getLogger(__name__)
+        self.profiles: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable crawl state {self.path}: {str(e)}")
+            return {}
+        if data.get('version') != self.VERSION:
+            return {}
+        return data.get('profiles', {})
+
+    def seed(self, magicians: Dict[str, Any]):
+        """Treat stored magicians as crawled when they were last updated.
+
+        Lets the first incremental run skip profiles from a full crawl that
+        are not due yet, instead of fetching everything once more.
+        """
+        listings = []
+        for magician in magicians.get('magicians', []):
+            listings.append(((magician.get('contact') or {}).get('website'), magician.get('id'), magician.get('last_updated')))
+            # Listings merged in from other directory sites have their own profile URLs
+            for listing in (magician.get('sources') or {}).values():
+                listings.append((listing.get('url'), listing.get('id'), listing.get('last_updated')))
+
+        for url, profile_id, last_updated in listings:
+            if not url or url in self.profiles:
+                continue
+            try:
+                updated = datetime.fromisoformat(last_updated).timestamp()
+            except (TypeError, ValueError):
+                continue
+            self.profiles[url] = {
+                'id': profile_id,
+                'etag': None,
+                'last_modified': None,
+                'fingerprint': None,
+                'last_crawled': updated,
+                'last_changed': updated,
+                'crawls': 1,
+                'changes': 1
+            }
+
+    def interval(self, url: str) -> float:
+        """Seconds until a profile is due, from how often it changed when crawled."""
+        entry = self.profiles.get(url)
+        if entry is None:
+            return 0.0
+        # Smoothed change rate, so one unchanged crawl does not push a profile out a month
+        change_rate = (entry['changes'] + 1) / (entry['crawls'] + 2)
+        return min(self.MAX_INTERVAL, max(self.MIN_INTERVAL, self.BASE_INTERVAL / change_rate))
+
+    def is_due(self, url: str, now: Optional[float] = None) -> bool:
+        entry = self.profiles.get(url)
+        if entry is None:
+            return True
+        now = time.time() if now is None else now
+        return now - entry['last_crawled'] >= self.interval(url)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        entry = self.profiles.get(url) or {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def record(self, url: str, profile_id: str, response) -> bool:
+        """Record a fetched profile and return whether it changed since the last crawl."""
+        now = time.time()
+        entry = self.profiles.get(url) or {
+            'id': profile_id, 'etag': None, 'last_modified': None, 'fingerprint': None,
+            'last_crawled': now, 'last_changed': None, 'crawls': 0, 'changes': 0
+        }
+        if response.status == 304:
+            changed = False
+        else:
+            fingerprint = page_fingerprint(response.body)
+            changed = fingerprint != entry['fingerprint']
+            entry['fingerprint'] = fingerprint
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            entry['etag'] = etag.decode('latin-1') if etag else None
+            entry['last_modified'] = last_modified.decode('latin-1') if last_modified else None
+
+        entry['id'] = profile_id
+        entry['last_crawled'] = now
+        entry['crawls'] += 1
+        if changed:
+            entry['changes'] += 1
+            entry['last_changed'] = now
+        self.profiles[url] = entry
+        return changed
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': self.VERSION, 'profiles': self.profiles}, f, indent=2, sort_keys=True)
+        tmp_path.replace(self.path)
@@ -0,0 +1,256 @@
+import re
+import time
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from location_index import location_key
+
+_NON_WORD = re.compile(r'[^\w\s]+')
+# Words directory listings add around a performer's name
+_FILLER_WORDS = frozenset({
+    'the', 'a', 'and', 'mr', 'mrs', 'ms', 'dr', 'magic', 'magician', 'magicians', 'illusionist',
+    'mentalist', 'entertainment', 'entertainer', 'productions', 'show', 'shows', 'llc', 'inc', 'co'
+})
+
+
+def normalize_name(name: Optional[str]) -> str:
+    words = _NON_WORD.sub(' ', (name or '').casefold()).split()
+    kept = [word for word in words if word not in _FILLER_WORDS]
+    return ' '.join(kept or words)
+
+
+def phone_digits(phone: Optional[str]) -> Optional[str]:
+    digits = ''.join(filter(str.isdigit, str(phone or '')))
+    if len(digits) == 11 and digits[0] == '1':
+        digits = digits[1:]
+    return digits if len(digits) == 10 else None
+
+
+def website_domain(url: Optional[str]) -> Optional[str]:
+    """Lower-cased host of a website URL without its www. prefix."""
+    url = (url or '').strip()
+    if not url:
+        return None
+    try:
+        host = urlsplit(url if '//' in url else f'//{url}').hostname
+    except ValueError:
+        return None
+    if host and host.startswith('www.'):
+        host = host[4:]
+    return host or None
+
+
+def name_similarity(a: str, b: str, minimum: float = 0.0) -> float:
+    """Best of character similarity and word overlap, both in [0, 1].
+
+    Scores that cannot reach minimum may be returned as any lower value.
+    """
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    words_a, words_b = set(a.split()), set(b.split())
+    overlap = len(words_a & words_b) / len(words_a | words_b)
+    floor = max(overlap, minimum)
+    # Length and character-count upper bounds rule out most pairs before the full comparison
+    if 2 * min(len(a), len(b)) / (len(a) + len(b)) < floor:
+        return overlap
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    if matcher.quick_ratio() < floor:
+        return overlap
+    return max(overlap, matcher.ratio())
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == '' or value == [] or value == {}
+
+
+def _is_string_list(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(entry, str) for entry in value)
+
+
+def _source_of(item: Dict[str, Any]) -> str:
+    return item.get('source') or item['id'].split('_', 1)[0]
+
+
+class DuplicateMergePipeline:
+    """Merge the same performer listed on several directory sites into one record.
+
+    Candidates are blocked by normalized (city, state), phone number and
+    website domain, so each item is only compared with a handful of records.
+    Scraped profiles carry the directory's own profile URL as their website,
+    so the directory hosts are left out of website blocking. A match keeps
+    the first-seen record's id and adds the new listing under 'sources'.
+    """
+
+    NAME_THRESHOLD = 0.85
+    # A shared phone number is strong evidence on its own, so the name may differ more
+    PHONE_NAME_THRESHOLD = 0.6
+    MAX_CANDIDATES = 200
+
+    def __init__(self, time_budget: float = 60.0):
+        self.time_budget = time_budget
+        self.canonical: Dict[str, Dict[str, Any]] = {}
+        self.aliases: Dict[str, str] = {}
+        self.blocks: Dict[Tuple[str, Any], List[str]] = defaultdict(list)
+        self._blocked: Set[Tuple[Tuple[str, Any], str]] = set()
+        # A directory's host would put all of that site's listings in one block
+        self.directory_hosts: Set[str] = set()
+        # Normalized name, phone digits and sources per canonical record, computed once
+        self._match_keys: Dict[str, Tuple[str, Optional[str], Set[str]]] = {}
+        self.match_time = 0.0
+        self.counts = {'merged': 0, 'distinct': 0, 'comparisons': 0, 'over_budget': 0}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(time_budget=crawler.settings.getfloat('DEDUP_TIME_BUDGET', 60.0))
+
+    def open_spider(self, spider):
+        for spec in (getattr(spider, 'sources', None) or {}).values():
+            host = website_domain(spec.start_url)
+            if host:
+                self.directory_hosts.add(host)
+        existing = getattr(spider, 'existing_magicians', None) or {'magicians': []}
+        for record in existing['magicians']:
+            self._add_canonical(record)
+            for listing in (record.get('sources') or {}).values():
+                self.aliases[listing['id']] = record['id']
+
+    def _block_keys(self, item: Dict[str, Any]) -> Set[Tuple[str, Any]]:
+        keys = set()
+        location = item.get('location') or {}
+        if location.get('city'):
+            keys.add(('location', location_key(location.get('city'), location.get('state'))))
+        phone = phone_digits((item.get('contact') or {}).get('phone'))
+        if phone:
+            keys.add(('phone', phone))
+        domain = website_domain((item.get('contact') or {}).get('website'))
+        if domain and not any(domain == host or domain.endswith('.' + host) for host in self.directory_hosts):
+            keys.add(('website', domain))
+        return keys
+
+    def _add_canonical(self, record: Dict[str, Any]):
+        self.canonical[record['id']] = record
+        self.aliases[record['id']] = record['id']
+        self._match_keys[record['id']] = (
+            normalize_name(record.get('name')),
+            phone_digits((record.get('contact') or {}).get('phone')),
+            self._sources_of(record)
+        )
+        # A merge can bring in a phone number, which opens a new block
+        for key in self._block_keys(record):
+            if (key, record['id']) not in self._blocked:
+                self._blocked.add((key, record['id']))
+                self.blocks[key].append(record['id'])
+
+    def _find_match(self, item: Dict[str, Any]) -> Optional[str]:
+        if self.match_time > self.time_budget:
+            self.counts['over_budget'] += 1
+            return None
+        start = time.perf_counter()
+        name = normalize_name(item.get('name'))
+        phone = phone_digits((item.get('contact') or {}).get('phone'))
+        source = _source_of(item)
+
+        best_id, best_score = None, 0.0
+        candidates: Set[str] = set()
+        for key in self._block_keys(item):
+            candidates.update(self.blocks.get(key, ())[:self.MAX_CANDIDATES])
+        for candidate_id in candidates:
+            candidate_name, candidate_phone, candidate_sources = self._match_keys[candidate_id]
+            # Listings from the same site are distinct performers by construction
+            if source in candidate_sources:
+                continue
+            self.counts['comparisons'] += 1
+            same_phone = phone is not None and phone == candidate_phone
+            threshold = self.PHONE_NAME_THRESHOLD if same_phone else self.NAME_THRESHOLD
+            score = name_similarity(name, candidate_name, max(threshold, best_score))
+            if score >= threshold and score > best_score:
+                best_id, best_score = candidate_id, score
+
+        self.match_time += time.perf_counter() - start
+        return best_id
+
+    @staticmethod
+    def _sources_of(record: Dict[str, Any]) -> Set[str]:
+        return set(record.get('sources') or ()) | {_source_of(record)}
+
+    @staticmethod
+    def _listing(item: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'id': item['id'],
+            'url': (item.get('contact') or {}).get('website'),
+            'rating': item.get('rating'),
+            'reviews_count': item.get('reviews_count'),
+            'last_updated': item.get('last_updated')
+        }
+
+    def _merge(self, canonical: Dict[str, Any], item: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill the canonical record's gaps from the item and combine ratings and services."""
+        merged = dict(canonical)
+        sources = dict(merged.get('sources') or {})
+        sources.setdefault(_source_of(canonical), self._listing(canonical))
+        sources[_source_of(item)] = self._listing(item)
+        primary = _source_of(canonical) == _source_of(item)
+
+        for key, value in item.items():
+            if key in ('id', 'source', 'sources') or _is_empty(value):
+                continue
+            current = merged.get(key)
+            if _is_string_list(value) and _is_string_list(current):
+                merged[key] = sorted(set(current) | set(value))
+            elif isinstance(value, dict) and isinstance(current, dict):
+                merged[key] = {
+                    **current,
+                    **{k: v for k, v in value.items() if not _is_empty(v) and (primary or _is_empty(current.get(k)))}
+                }
+            elif primary or _is_empty(current):
+                merged[key] = value
+
+        # Ratings from every listing, weighted by how many reviews each rests on
+        listings = [listing for listing in sources.values() if listing.get('rating') is not None]
+        total_reviews = sum(listing.get('reviews_count') or 0 for listing in listings)
+        if total_reviews:
+            merged['rating'] = round(
+                sum(listing['rating'] * (listing.get('reviews_count') or 0) for listing in listings) / total_reviews, 2
+            )
+            merged['reviews_count'] = total_reviews
+        merged['sources'] = sources
+        return merged
+
+    def process_item(self, item: Dict[str, Any], spider) -> Dict[str, Any]:
+        canonical_id = self.aliases.get(item['id']) or self._find_match(item)
+        if canonical_id is None:
+            self.counts['distinct'] += 1
+            self._add_canonical(item)
+            return item
+
+        canonical = self.canonical[canonical_id]
+        if canonical_id == item['id'] and not canonical.get('sources'):
+            # A re-scrape of a record that was never merged replaces it as before
+            self.counts['distinct'] += 1
+            self._add_canonical(item)
+            return item
+
+        if canonical_id != item['id']:
+            self.counts['merged'] += 1
+            self.aliases[item['id']] = canonical_id
+        merged = self._merge(canonical, item)
+        self._add_canonical(merged)
+        return merged
+
+    def close_spider(self, spider):
+        spider.logger.info(
+            f"Dedup: {self.counts['merged']} listings merged into existing performers, "
+            f"{self.counts['distinct']} distinct, {self.counts['comparisons']} name comparisons "
+            f"in {self.match_time:.2f}s"
+        )
+        if self.counts['over_budget']:
+            spider.logger.warning(
+                f"Dedup time budget of {self.time_budget}s exceeded; "
+                f"{self.counts['over_budget']} items were kept without matching"
+            )
+        for key, value in self.counts.items():
+            spider.crawler.stats.set_value(f'dedup/{key}', value)
@@ -0,0 +1,264 @@
+import re
+from typing import Any, Callable, Dict, Optional
+
+from lxml import etree
+from parsel.csstranslator import HTMLTranslator
+
+from scraper.normalizer import PRICE_PATTERN
+
+_translator = HTMLTranslator()
+_YEARS = re.compile(r'(\d+)(?:\s+)?(?:years?|yrs?)')
+_DIGITS = re.compile(r'\d+')
+
+
+class Field:
+    """One value to extract: a CSS selector compiled once to XPath, a post-processor and a default.
+
+    many=True collects every match instead of the first. With fields, each
+    match is extracted with that nested spec (e.g. pricing packages).
+    """
+
+    def __init__(
+        self,
+        css: str,
+        process: Optional[Callable[[Any], Any]] = None,
+        default: Any = None,
+        many: bool = False,
+        fields: Optional[Dict[str, Any]] = None
+    ):
+        self.css = css
+        self.process = process
+        self.default = default
+        self.many = many
+        self.fields = fields
+        # Same translation parsel does on every .css() call, done once per spider instead
+        self.xpath = etree.XPath(_translator.css_to_xpath(css))
+
+    def extract(self, node) -> Any:
+        results = self.xpath(node)
+        if self.fields is not None:
+            values = [extract_fields(self.fields, element) for element in results]
+            return values if self.many else (values[0] if values else self.default)
+        if self.many:
+            value = [_as_value(result) for result in results]
+        else:
+            value = _as_value(results[0]) if results else self.default
+        return self.process(value) if self.process is not None else value
+
+
+def _as_value(result) -> Any:
+    # Text and attribute results keep their whole document alive; copy them to plain strings
+    return str(result) if isinstance(result, str) else result
+
+
+def extract_fields(spec: Dict[str, Any], node) -> Dict[str, Any]:
+    """Apply a field spec to a card or page; nested dicts nest, other values are constants."""
+    item = {}
+    for key, field in spec.items():
+        if isinstance(field, Field):
+            item[key] = field.extract(node)
+        elif isinstance(field, dict):
+            item[key] = extract_fields(field, node)
+        else:
+            item[key] = field
+    return item
+
+
+def strip(value: Optional[str]) -> str:
+    return (value or '').strip()
+
+
+def strip_all(values):
+    return [value.strip() for value in values]
+
+
+def present(value) -> bool:
+    return value is not None
+
+
+def to_float(value: Optional[str]) -> float:
+    return float(value or 0)
+
+
+def first_int(value: Optional[str]) -> int:
+    match = _DIGITS.search(value or '')
+    return int(match.group(0)) if match else 0
+
+
+def extract_price(price_text: Optional[str]) -> Optional[float]:
+    """Extract numeric price from text."""
+    match = PRICE_PATTERN.search(price_text or '')
+    return float(match.group(1).replace(',', '')) if match else None
+
+
+def extract_years(experience_text: Optional[str]) -> Optional[int]:
+    """Extract years of experience from text."""
+    match = _YEARS.search((experience_text or '').lower())
+    return int(match.group(1)) if match else None
+
+
+def parse_location(value: Optional[str]) -> Dict[str, Any]:
+    """Split a "City, ST" label into the location dict used by magician records."""
+    parts = (value or '').split(',')
+    return {
+        'city': parts[0].strip(),
+        'state': parts[1].strip() if len(parts) > 1 else '',
+        'coordinates': {'latitude': None, 'longitude': None}
+    }
+
+
+class SourceSpec:
+    """Everything the spider needs to crawl one directory site.
+
+    listing_fields are read from each card on a listing page, profile_fields
+    from the profile page; the spider adds source, website and last_updated.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        id_prefix: str,
+        start_url: str,
+        card: str,
+        profile_link: str,
+        next_page: str,
+        listing_fields: Dict[str, Any],
+        profile_fields: Dict[str, Any]
+    ):
+        self.name = name
+        self.id_prefix = id_prefix
+        self.start_url = start_url
+        self.card = Field(card, many=True)
+        self.profile_link = Field(profile_link)
+        self.next_page = Field(next_page)
+        self.listing_fields = listing_fields
+        self.profile_fields = profile_fields
+
+    def parse_card(self, card) -> Dict[str, Any]:
+        item = extract_fields(self.listing_fields, card)
+        item['id'] = f"{self.id_prefix}{item['id']}"
+        item['source'] = self.name
+        return item
+
+
+def build_sources() -> Dict[str, SourceSpec]:
+    """Compile the spec of every supported directory site, keyed by source name."""
+    sources = [
+        SourceSpec(
+            name='thebash',
+            id_prefix='tb_',
+            start_url='https://www.thebash.com/services/magician',
+            card='.vendor-card',
+            profile_link='.vendor-card__link::attr(href)',
+            next_page='.pagination__next::attr(href)',
+            listing_fields={
+                'id': Field('::attr(data-vendor-id)'),
+                'name': Field('.vendor-card__name::text', process=strip),
+                'services': Field('.vendor-card__categories::text', process=strip_all, many=True),
+                'location': Field('.vendor-card__location::text', process=parse_location),
+                'rating': Field('.vendor-card__rating-score::text', process=to_float),
+                'reviews_count': Field('.vendor-card__rating-count::text', process=first_int)
+            },
+            profile_fields={
+                'description': Field('.vendor-bio::text', process=strip),
+                'experience_years': Field('.vendor-experience::text', process=extract_years),
+                'performance_types': Field('.performance-types li::text', many=True),
+                'travel_distance': Field('.travel-distance::text', process=strip),
+                'insurance': {
+                    'has_insurance': Field('.insurance-badge', process=present),
+                    'details': Field('.insurance-details::text', process=strip)
+                },
+                'pricing': {
+                    'starting_price': Field('.starting-price::text', process=extract_price),
+                    'price_range': Field('.price-range::text', process=strip)
+                },
+                'contact': {
+                    'phone': Field('.contact-phone::text', default=''),
+                    'email': Field('.contact-email::text', default='')
+                },
+                'social_media': {
+                    'facebook': Field('.social-facebook::attr(href)', default=''),
+                    'instagram': Field('.social-instagram::attr(href)'),
+                    'youtube': Field('.social-youtube::attr(href)')
+                }
+            }
+        ),
+        SourceSpec(
+            name='bark',
+            id_prefix='bark_',
+            start_url='https://www.bark.com/en/us/magician/',
+            card='.professional-card',
+            profile_link='.pro-profile-link::attr(href)',
+            next_page='.pagination-next::attr(href)',
+            listing_fields={
+                'id': Field('::attr(data-pro-id)'),
+                'name': Field('.pro-name::text', process=strip),
+                'services': Field('.pro-services li::text', process=strip_all, many=True),
+                'location': Field('.pro-location::text', process=parse_location),
+                'rating': Field('.pro-rating::text', process=to_float),
+                'reviews_count': Field('.review-count::text', process=first_int)
+            },
+            profile_fields={
+                'description': Field('.pro-description::text', process=strip),
+                'badges': Field('.pro-badges span::text', many=True),
+                'response_time': Field('.response-time::text', process=strip),
+                'services_offered': Field('.services-list li::text', many=True),
+                'availability': {
+                    'days': Field('.availability-days li::text', many=True),
+                    'hours': Field('.availability-hours::text', process=strip)
+                },
+                'pricing': {
+                    'rate_type': Field('.rate-type::text', process=strip),
+                    'rate_range': Field('.rate-range::text', process=strip)
+                },
+                'contact': {
+                    'phone': None,  # Usually hidden behind contact form
+                    'email': None
+                }
+            }
+        ),
+        SourceSpec(
+            name='gigsalad',
+            id_prefix='gs_',
+            start_url='https://www.gigsalad.com/Magic/Magician',
+            card='.performer-card',
+            profile_link='.performer-link::attr(href)',
+            next_page='.pagination__next::attr(href)',
+            listing_fields={
+                'id': Field('::attr(data-performer-id)'),
+                'name': Field('.performer-name::text', process=strip),
+                'services': Field('.performer-categories span::text', process=strip_all, many=True),
+                'location': Field('.performer-location::text', process=parse_location),
+                'rating': Field('.performer-rating::text', process=to_float),
+                'reviews_count': Field('.review-count::text', process=first_int)
+            },
+            profile_fields={
+                'description': Field('.bio-content::text', process=strip),
+                'performance_length': Field('.performance-length::text', process=strip),
+                'languages': Field('.languages li::text', many=True),
+                'payment_methods': Field('.payment-methods li::text', many=True),
+                'cancellation_policy': Field('.cancellation-policy::text', process=strip),
+                'insurance': {
+                    'has_insurance': Field('.insurance-verified', process=present),
+                    'details': Field('.insurance-details::text', process=strip)
+                },
+                'equipment': {
+                    'provides': Field('.equipment-provides li::text', many=True),
+                    'needs': Field('.equipment-needs li::text', many=True)
+                },
+                'pricing': {
+                    'starting_price': Field('.starting-price::text', process=extract_price),
+                    'packages': Field('.pricing-package', many=True, fields={
+                        'name': Field('.package-name::text', process=strip),
+                        'price': Field('.package-price::text', process=extract_price),
+                        'description': Field('.package-description::text', process=strip)
+                    })
+                },
+                'contact': {
+                    'phone': None,  # Usually hidden behind booking system
+                    'email': None
+                }
+            }
+        )
+    ]
+    return {source.name: source for source in sources}
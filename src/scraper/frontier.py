@@ -0,0 +1,75 @@
+import math
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from location_index import location_key
+
+DAY = 86400
+
+# Listing pages sit mid-range among profile scores (0-100): valuable or stale profiles are
+# fetched before the next listing page, low-value ones after it
+LISTING_PRIORITY = 50
+# Share of a page or time budget pagination may use; the rest is left for profiles
+LISTING_BUDGET_SHARE = 0.5
+
+
+def listing_budget_spent(listing_pages: int, elapsed: float, max_pages: int, max_seconds: float,
+                         share: float = LISTING_BUDGET_SHARE) -> bool:
+    """Whether following more listing pages would eat into the profiles' share of the crawl budget."""
+    return bool(
+        (max_pages and listing_pages >= max_pages * share)
+        or (max_seconds and elapsed >= max_seconds * share)
+    )
+
+
+class ProfilePrioritizer:
+    """Scores profile requests so a bounded crawl refreshes the most valuable records first.
+
+    Scores run from 0 to 100 and are used as Scrapy request priorities. They
+    combine rating, review count, how stale the stored record is and how few
+    magicians its city has.
+    """
+
+    RATING_WEIGHT = 25
+    REVIEWS_WEIGHT = 25
+    STALENESS_WEIGHT = 30
+    SPARSE_CITY_WEIGHT = 20
+    # Review count and record age at which those parts of the score max out
+    REVIEWS_SATURATION = 500
+    STALE_AFTER = 30 * DAY
+
+    def __init__(self, existing_magicians: Dict[str, Any], now: Optional[float] = None):
+        self.now = time.time() if now is None else now
+        self.updated: Dict[str, float] = {}
+        self.city_counts: Counter = Counter()
+        for magician in existing_magicians.get('magicians', []):
+            location = magician.get('location') or {}
+            self.city_counts[location_key(location.get('city'), location.get('state'))] += 1
+            try:
+                self.updated[magician['id']] = datetime.fromisoformat(magician['last_updated']).timestamp()
+            except (KeyError, TypeError, ValueError):
+                continue
+
+    def score(self, basic_info: Dict[str, Any]) -> float:
+        rating = min(max(basic_info.get('rating') or 0, 0), 5) / 5
+        reviews = min(1.0, math.log1p(basic_info.get('reviews_count') or 0) / math.log1p(self.REVIEWS_SATURATION))
+
+        updated = self.updated.get(basic_info['id'])
+        # A profile never stored before is as stale as it gets
+        staleness = 1.0 if updated is None else min(1.0, max(0.0, self.now - updated) / self.STALE_AFTER)
+
+        location = basic_info.get('location') or {}
+        known = self.city_counts[location_key(location.get('city'), location.get('state'))]
+        sparse_city = 1 / (1 + known)
+
+        return (
+            self.RATING_WEIGHT * rating
+            + self.REVIEWS_WEIGHT * reviews
+            + self.STALENESS_WEIGHT * staleness
+            + self.SPARSE_CITY_WEIGHT * sparse_city
+        )
+
+    def priority(self, basic_info: Dict[str, Any]) -> int:
+        return int(round(self.score(basic_info)))
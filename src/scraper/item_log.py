@@ -0,0 +1,70 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Set
+
+
+class ItemLog:
+    """Append-only JSONL log of scraped items, flushed to disk in batches.
+
+    The log survives a crash or forced shutdown; the next crawl replays it
+    and skips profiles that were already scraped.
+    """
+
+    def __init__(self, path: Path, batch_size: int = 25):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.logger = logging.getLogger(__name__)
+        self._buffer: List[str] = []
+        self._file = None
+
+    def append(self, item: Dict[str, Any]):
+        self._buffer.append(json.dumps(item, sort_keys=True, default=str))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered items and fsync so they survive a crash."""
+        if not self._buffer:
+            return
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write('\n'.join(self._buffer) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._buffer = []
+
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        """Yield logged items in order, skipping a torn final line."""
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    self.logger.warning(f"Skipping unreadable line {line_number} of {self.path}")
+
+    def completed_ids(self) -> Set[str]:
+        """Ids of logged items, including listings merged into them from other sources."""
+        ids = set()
+        for item in self.replay():
+            if 'id' in item:
+                ids.add(item['id'])
+            ids.update(listing['id'] for listing in (item.get('sources') or {}).values())
+        return ids
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """Delete the log once its items have been compacted into magicians.json."""
+        self.close()
+        self.path.unlink(missing_ok=True)
@@ -1,41 +1,300 @@
 from scrapy import signals
 from scrapy.downloadermiddlewares.retry import RetryMiddleware
+from scrapy.utils.httpobj import urlparse_cached
 from scrapy.utils.response import response_status_message
+import json
 import time
 from collections import defaultdict
-from datetime import datetime, timedelta
+from pathlib import Path
 import logging
 
+from scraper.normalizer import Normalizer
+
+# Phrases of error pages that some sites serve with a 200 status
+ERROR_PATTERNS = (
+    b'too many requests',
+    b'service unavailable',
+    b'internal server error',
+    b'gateway timeout'
+)
+# Error pages state the problem near the top; only this much of the body is scanned
+ERROR_SCAN_BYTES = 4096
+# Successful responses larger than this are real pages, not disguised errors
+SOFT_ERROR_MAX_BYTES = 32768
+
+
+def error_pattern(response):
+    """Return the error phrase in a plausible error page, or None."""
+    body = response.body
+    if not body:
+        return None
+    if response.status < 400 and len(body) > SOFT_ERROR_MAX_BYTES:
+        return None
+    content_type = response.headers.get(b'Content-Type', b'text/html')
+    if not (content_type.startswith(b'text/') or b'html' in content_type):
+        return None
+    # Bytes substring search on a bounded head beats a case-insensitive regex in CPython
+    head = body[:ERROR_SCAN_BYTES].lower()
+    for pattern in ERROR_PATTERNS:
+        if pattern in head:
+            return pattern.decode('ascii')
+    return None
+
+
+class DomainThrottle:
+    """Learned delay and concurrency for one domain."""
+
+    def __init__(self, delay: float, concurrency: int):
+        self.delay = delay
+        self.concurrency = concurrency
+        self.latency = None
+        self.stable_responses = 0
+
+
 class DomainRateLimitMiddleware:
-    """Middleware to implement per-domain rate limiting."""
-    
-    def __init__(self):
-        self.last_request = defaultdict(lambda: datetime.min)
-        self.domain_delays = {
-            'thebash.com': 3,      # 3 seconds between requests
-            'bark.com': 2,         # 2 seconds between requests
-            'gigsalad.com': 2.5    # 2.5 seconds between requests
-        }
-        self.default_delay = 2     # Default delay for unknown domains
-        
+    """Adaptive per-domain rate limiter that drives Scrapy's downloader slots.
+
+    Each domain starts from the rate learned on the previous crawl (or its
+    DOMAIN_DELAYS entry). The delay backs off exponentially on 429/503, error
+    pages and download errors. Concurrency rises by one, and the delay
+    relaxes towards its configured floor, after a run of responses with
+    stable latency.
+
+    Pacing is applied to the domain's download slot (its delay and
+    concurrency) rather than by holding requests in this middleware. Requests
+    waiting on a slow domain's slot then sit in that slot's queue, and the
+    downloader-aware scheduler queue keeps handing out other domains'
+    requests meanwhile. The time each request waits there is recorded per
+    domain. Managed slots do not randomize their delay, so the configured
+    delay stays a floor.
+    """
+
+    DEFAULT_DOMAIN_DELAYS = {
+        'thebash.com': 3,      # 3 seconds between requests
+        'bark.com': 2,         # 2 seconds between requests
+        'gigsalad.com': 2.5    # 2.5 seconds between requests
+    }
+    BACKOFF_STATUSES = (429, 503)
+    # Responses in a row within LATENCY_TOLERANCE of the average before speeding up
+    STABLE_RESPONSES = 10
+    LATENCY_TOLERANCE = 1.5
+    SPEEDUP = 0.9
+
+    def __init__(self, domain_delays=None, default_delay=2, stats=None, max_delay=60,
+                 max_concurrency=4, state_path=None, crawler=None):
+        self.domain_delays = domain_delays or dict(self.DEFAULT_DOMAIN_DELAYS)
+        self.default_delay = default_delay     # Default delay for unknown domains
+        self.stats = stats
+        self.max_delay = max_delay
+        self.max_concurrency = max(1, max_concurrency)
+        self.state_path = Path(state_path) if state_path else None
+        self.crawler = crawler
+        self.learned = self._load_learned()
+        self.domains = {}
+        self.max_queue_depth = defaultdict(int)
+        self.requests = defaultdict(int)
+        self.wait_seconds = defaultdict(float)
+        self.backoffs = defaultdict(int)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        middleware = cls(
+            domain_delays=settings.getdict('DOMAIN_DELAYS') or None,
+            default_delay=settings.getfloat('DOMAIN_DEFAULT_DELAY', 2),
+            stats=crawler.stats,
+            max_delay=settings.getfloat('DOMAIN_MAX_DELAY', 60),
+            max_concurrency=settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN', 4),
+            state_path=settings.get('DOMAIN_RATES_FILE'),
+            crawler=crawler
+        )
+        crawler.signals.connect(middleware.request_scheduled, signal=signals.request_scheduled)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def _load_learned(self):
+        if self.state_path is None or not self.state_path.exists():
+            return {}
+        try:
+            with open(self.state_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _domain(self, request):
+        """Map a request to its configured domain, so www.bark.com shares bark.com's slot."""
+        host = urlparse_cached(request).hostname or ''
+        for domain in self.domain_delays:
+            if host == domain or host.endswith('.' + domain):
+                return domain
+        return host
+
+    def _min_delay(self, domain):
+        # The configured delay is a politeness floor that speeding up never goes below
+        return max(0.01, self.domain_delays.get(domain, self.default_delay))
+
+    def _throttle(self, domain):
+        if domain not in self.domains:
+            learned = self.learned.get(domain, {})
+            delay = min(self.max_delay, max(self._min_delay(domain), learned.get('delay', 0)))
+            concurrency = min(self.max_concurrency, max(1, learned.get('concurrency', 1)))
+            self.domains[domain] = DomainThrottle(delay, concurrency)
+        return self.domains[domain]
+
+    def _downloader(self):
+        engine = getattr(self.crawler, 'engine', None)
+        return getattr(engine, 'downloader', None)
+
+    def _apply(self, domain, throttle):
+        """Push the domain's delay and concurrency onto its download slot.
+
+        A slot that does not exist yet picks them up from the per-slot
+        settings when the downloader creates it.
+        """
+        downloader = self._downloader()
+        if downloader is None:
+            return None
+        slot = downloader.slots.get(domain)
+        # RANDOMIZE_DOWNLOAD_DELAY would spread the delay over 0.5-1.5x, dipping below the floor.
+        # Scrapy 2.11 reads randomize_delay; later versions replaced it with jitter.
+        if slot is None:
+            per_slot_settings = getattr(downloader, 'per_slot_settings', None)
+            if per_slot_settings is not None:
+                per_slot_settings[domain] = {
+                    'delay': throttle.delay,
+                    'concurrency': throttle.concurrency,
+                    'randomize_delay': False,
+                    'jitter': 0
+                }
+            return None
+        slot.delay = throttle.delay
+        slot.concurrency = throttle.concurrency
+        if hasattr(slot, 'jitter'):
+            slot.jitter = 0
+        else:
+            slot.randomize_delay = False
+        return slot
+
+    def request_scheduled(self, request, spider):
+        # Keyed before scheduling, so the scheduler queue and the downloader agree on the slot
+        request.meta.setdefault('download_slot', self._domain(request))
+
     def process_request(self, request, spider):
-        domain = request.url.split('/')[2]
-        delay = self.domain_delays.get(domain, self.default_delay)
-        
-        # Calculate time since last request to this domain
-        last_req_time = self.last_request[domain]
-        now = datetime.now()
-        time_passed = (now - last_req_time).total_seconds()
-        
-        if time_passed < delay:
-            sleep_time = delay - time_passed
-            time.sleep(sleep_time)
-            
-        self.last_request[domain] = datetime.now()
+        domain = request.meta.setdefault('download_slot', self._domain(request))
+        self.requests[domain] += 1
+        # The slot queue comes next; whatever of the round trip is not download latency was waiting
+        request.meta['ratelimit_queued_at'] = time.monotonic()
+        slot = self._apply(domain, self._throttle(domain))
+        if slot is not None:
+            depth = len(slot.queue) + 1
+            if depth > self.max_queue_depth[domain]:
+                self.max_queue_depth[domain] = depth
+                if self.stats is not None:
+                    self.stats.max_value(f'ratelimit/{domain}/max_queue_depth', depth)
+        return None
+
+    def _known_throttle(self, request):
+        domain = request.meta.get('download_slot')
+        return domain, self.domains.get(domain)
+
+    def _record_wait(self, domain, request):
+        queued_at = request.meta.pop('ratelimit_queued_at', None)
+        if queued_at is None:
+            return
+        wait = max(0.0, time.monotonic() - queued_at - request.meta.get('download_latency', 0))
+        self.wait_seconds[domain] += wait
+        if self.stats is not None:
+            self.stats.inc_value(f'ratelimit/{domain}/wait_seconds', wait)
+            self.stats.max_value(f'ratelimit/{domain}/max_wait_seconds', wait)
+
+    def process_response(self, request, response, spider):
+        domain, throttle = self._known_throttle(request)
+        if throttle is None:
+            return response
+        self._record_wait(domain, request)
+
+        if response.status in self.BACKOFF_STATUSES or error_pattern(response):
+            retry_after = response.headers.get(b'Retry-After')
+            self._back_off(domain, throttle, spider, retry_after)
+            return response
+
+        latency = request.meta.get('download_latency')
+        if latency is None:
+            return response
+        if throttle.latency is None or latency <= throttle.latency * self.LATENCY_TOLERANCE:
+            throttle.stable_responses += 1
+        else:
+            throttle.stable_responses = 0
+        throttle.latency = latency if throttle.latency is None else 0.8 * throttle.latency + 0.2 * latency
+
+        if throttle.stable_responses >= self.STABLE_RESPONSES:
+            throttle.stable_responses = 0
+            throttle.concurrency = min(self.max_concurrency, throttle.concurrency + 1)
+            self._set_delay(domain, throttle, throttle.delay * self.SPEEDUP)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        domain, throttle = self._known_throttle(request)
+        if throttle is not None:
+            self._record_wait(domain, request)
+            self._back_off(domain, throttle, spider)
+        return None
+
+    def _back_off(self, domain, throttle, spider, retry_after=None):
+        self.backoffs[domain] += 1
+        throttle.stable_responses = 0
+        throttle.concurrency = max(1, throttle.concurrency // 2)
+        self._set_delay(domain, throttle, throttle.delay * 2)
+        try:
+            pause = float(retry_after) if retry_after else 0
+        except ValueError:
+            pause = 0  # HTTP-date form; the doubled delay still applies
+        slot = self._apply(domain, throttle)
+        if pause > 0 and slot is not None:
+            # The slot sends its next request once delay has passed since lastseen. Scrapy stamps
+            # lastseen with time() in 2.11 and monotonic() later, so use the clock it is close to.
+            pause = min(pause, self.max_delay)
+            now = min(time.time(), time.monotonic(), key=lambda clock: abs(clock - slot.lastseen))
+            slot.lastseen = max(slot.lastseen, now + pause - slot.delay)
+        if self.stats is not None:
+            self.stats.inc_value(f'ratelimit/{domain}/backoffs')
+        spider.logger.info(
+            f'Backing off {domain}: delay {throttle.delay:.2f}s, concurrency {throttle.concurrency}'
+        )
+
+    def _set_delay(self, domain, throttle, delay):
+        throttle.delay = min(self.max_delay, max(self._min_delay(domain), delay))
+        self._apply(domain, throttle)
+
+    def _save_learned(self):
+        learned = dict(self.learned)
+        for domain, throttle in self.domains.items():
+            learned[domain] = {
+                'delay': round(throttle.delay, 3),
+                'concurrency': throttle.concurrency,
+                'latency': round(throttle.latency, 3) if throttle.latency is not None else None
+            }
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(learned, f, indent=2, sort_keys=True)
+        tmp_path.replace(self.state_path)
+
+    def spider_closed(self, spider):
+        for domain in sorted(self.requests):
+            throttle = self.domains[domain]
+            spider.logger.info(
+                f'Rate limit {domain}: {self.requests[domain]} requests, '
+                f'{self.wait_seconds[domain]:.1f}s waiting, max slot queue depth {self.max_queue_depth[domain]}, '
+                f'{self.backoffs[domain]} backoffs, ending at {throttle.delay:.2f}s delay '
+                f'and concurrency {throttle.concurrency}'
+            )
+        if self.state_path is not None:
+            self._save_learned()
 
 class CustomRetryMiddleware(RetryMiddleware):
     """Custom retry middleware with enhanced error handling."""
-    
+
     def __init__(self, settings):
         super().__init__(settings)
         self.max_retry_times = settings.getint('RETRY_TIMES', 3)
@@ -54,23 +313,15 @@ class CustomRetryMiddleware(RetryMiddleware):
             return self._retry(request, reason, spider) or response
             
         # Check for common error patterns in response
-        error_patterns = [
-            'too many requests',
-            'service unavailable',
-            'internal server error',
-            'gateway timeout'
-        ]
-        
-        response_body = response.body.lower().decode('utf-8', errors='ignore')
-        for pattern in error_patterns:
-            if pattern in response_body:
-                spider.logger.warning(
-                    f'Error pattern "{pattern}" found in response from {request.url}'
-                )
-                return self._retry(request, pattern, spider) or response
+        pattern = error_pattern(response)
+        if pattern:
+            spider.logger.warning(
+                f'Error pattern "{pattern}" found in response from {request.url}'
+            )
+            return self._retry(request, pattern, spider) or response
                 
         return response
-        
+
     def process_exception(self, request, exception, spider):
         spider.logger.error(
             f'Error processing {request.url}: {type(exception).__name__}: {str(exception)}'
@@ -79,15 +330,24 @@ class CustomRetryMiddleware(RetryMiddleware):
 
 class DataCleaningMiddleware:
     """Middleware for cleaning and normalizing scraped data."""
+
+    def __init__(self, normalizer=None):
+        # Compiled once per crawl; see scraper.normalizer
+        self.normalizer = normalizer or Normalizer()
     
     @classmethod
     def from_crawler(cls, crawler):
         middleware = cls()
         crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
         return middleware
         
     def spider_opened(self, spider):
         spider.logger.info('Data cleaning middleware enabled')
+
+    def spider_closed(self, spider):
+        for name, info in self.normalizer.cache_info().items():
+            spider.logger.info(f'Cleaning cache {name}: {info.hits} hits, {info.misses} misses')
         
     def process_spider_output(self, response, result, spider):
         for item in result:
@@ -99,153 +359,7 @@ class DataCleaningMiddleware:
     def clean_item(self, item, spider):
         """Clean and normalize item data."""
         try:
-            # Clean basic fields
-            if 'name' in item:
-                item['name'] = self.clean_text(item['name'])
-                
-            if 'description' in item:
-                item['description'] = self.clean_text(item['description'])
-                
-            # Normalize services
-            if 'services' in item:
-                item['services'] = [
-                    self.clean_text(service) 
-                    for service in item['services'] 
-                    if service
-                ]
-                item['services'] = self.normalize_services(item['services'])
-                
-            # Clean location data
-            if 'location' in item:
-                if isinstance(item['location'], dict):
-                    for key in ['city', 'state']:
-                        if key in item['location']:
-                            item['location'][key] = self.clean_text(
-                                item['location'][key]
-                            )
-                            
-            # Normalize pricing
-            if 'pricing' in item and isinstance(item['pricing'], dict):
-                item['pricing'] = self.normalize_pricing(item['pricing'])
-                
-            # Clean contact information
-            if 'contact' in item and isinstance(item['contact'], dict):
-                item['contact'] = self.clean_contact_info(item['contact'])
-                
-            # Validate and clean dates
-            if 'last_updated' in item:
-                item['last_updated'] = self.validate_date(item['last_updated'])
-                
+            return self.normalizer.clean_item(item)
         except Exception as e:
             spider.logger.error(f'Error cleaning item: {str(e)}')
-            
         return item
-        
-    def clean_text(self, text):
-        """Clean and normalize text fields."""
-        if not text:
-            return None
-            
-        text = str(text).strip()
-        # Remove excessive whitespace
-        text = ' '.join(text.split())
-        # Remove common HTML artifacts
-        text = text.replace('&nbsp;', ' ').replace('&amp;', '&')
-        return text if text else None
-        
-    def normalize_services(self, services):
-        """Normalize service names."""
-        service_mapping = {
-            'close up': 'Close-up Magic',
-            'close-up': 'Close-up Magic',
-            'closeup': 'Close-up Magic',
-            'stage': 'Stage Magic',
-            'stage magic': 'Stage Magic',
-            'mentalism': 'Mentalism',
-            'mind reading': 'Mentalism',
-            'kids': 'Children\'s Magic',
-            'children': 'Children\'s Magic',
-            'birthday': 'Children\'s Magic',
-            'corporate': 'Corporate Magic',
-            'business': 'Corporate Magic'
-        }
-        
-        normalized = []
-        for service in services:
-            service = service.lower()
-            for key, value in service_mapping.items():
-                if key in service:
-                    normalized.append(value)
-                    break
-            else:
-                normalized.append(service.title())
-                
-        return list(set(normalized))
-        
-    def normalize_pricing(self, pricing):
-        """Normalize pricing information."""
-        if not isinstance(pricing, dict):
-            return pricing
-            
-        # Convert all prices to float
-        if 'starting_price' in pricing:
-            price = pricing['starting_price']
-            if isinstance(price, str):
-                pricing['starting_price'] = self.extract_price(price)
-                
-        # Normalize price ranges
-        if 'price_range' in pricing:
-            range_text = pricing['price_range']
-            if isinstance(range_text, str):
-                prices = self.extract_price_range(range_text)
-                pricing['price_range'] = {
-                    'min': prices[0] if prices else None,
-                    'max': prices[1] if prices and len(prices) > 1 else None
-                }
-                
-        return pricing
-        
-    def clean_contact_info(self, contact):
-        """Clean and validate contact information."""
-        if not isinstance(contact, dict):
-            return contact
-            
-        # Clean phone numbers
-        if 'phone' in contact:
-            contact['phone'] = self.normalize_phone(contact['phone'])
-            
-        # Clean email addresses
-        if 'email' in contact:
-            contact['email'] = self.clean_text(contact['email'])
-            
-        # Clean website URLs
-        if 'website' in contact:
-            contact['website'] = self.clean_text(contact['website'])
-            
-        return contact
-        
-    def normalize_phone(self, phone):
-        """Normalize phone number format."""
-        if not phone:
-            return None
-            
-        # Remove all non-numeric characters
-        digits = ''.join(filter(str.isdigit, str(phone)))
-        
-        # Format as (XXX) XXX-XXXX if 10 digits
-        if len(digits) == 10:
-            return f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
-        elif len(digits) == 11 and digits[0] == '1':
-            return f"({digits[1:4]}) {digits[4:7]}-{digits[7:]}"
-            
-        return phone
-        
-    def validate_date(self, date_str):
-        """Validate and normalize date format."""
-        try:
-            if isinstance(date_str, str):
-                # Parse ISO format date
-                datetime.fromisoformat(date_str)
-            return date_str
-        except (ValueError, TypeError):
-            return datetime.now().isoformat()
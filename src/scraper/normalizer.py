@@ -0,0 +1,177 @@
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+# Substring -> canonical service; earlier entries win when several appear in one service
+SERVICE_SYNONYMS = {
+    'close up': 'Close-up Magic',
+    'close-up': 'Close-up Magic',
+    'closeup': 'Close-up Magic',
+    'stage': 'Stage Magic',
+    'stage magic': 'Stage Magic',
+    'mentalism': 'Mentalism',
+    'mind reading': 'Mentalism',
+    'kids': 'Children\'s Magic',
+    'children': 'Children\'s Magic',
+    'birthday': 'Children\'s Magic',
+    'corporate': 'Corporate Magic',
+    'business': 'Corporate Magic'
+}
+
+# Amounts need a currency symbol, so durations and counts ("2 hours - $300") are not read as prices
+PRICE_PATTERN = re.compile(r'\$\s*(\d+(?:,\d{3})*(?:\.\d+)?)')
+NON_DIGIT_PATTERN = re.compile(r'\D+')
+
+
+def service_pattern(synonyms: Dict[str, str]) -> re.Pattern:
+    """One alternation over every synonym, longest first so 'stage magic' beats 'stage'."""
+    keys = sorted(synonyms, key=len, reverse=True)
+    return re.compile('|'.join(re.escape(key) for key in keys))
+
+
+def format_phone(digits: str) -> Optional[str]:
+    """Format 10 digits (or 11 with a leading 1) as (XXX) XXX-XXXX, else None."""
+    if len(digits) == 11 and digits[0] == '1':
+        digits = digits[1:]
+    if len(digits) == 10:
+        return f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
+    return None
+
+
+class Normalizer:
+    """Compiled cleaning rules for scraped magician items.
+
+    Tables and patterns are built once; values that repeat across items
+    (services, phones, prices, cities) are memoized.
+    """
+
+    def __init__(self, synonyms: Optional[Dict[str, str]] = None, cache_size: int = 65536):
+        self.synonyms = dict(synonyms or SERVICE_SYNONYMS)
+        self.priority = {key: index for index, key in enumerate(self.synonyms)}
+        self.service_pattern = service_pattern(self.synonyms)
+        self.normalize_service = lru_cache(maxsize=cache_size)(self._normalize_service)
+        self.normalize_phone = lru_cache(maxsize=cache_size)(self._normalize_phone)
+        self.clean_short_text = lru_cache(maxsize=cache_size)(self.clean_text)
+        self.extract_price = lru_cache(maxsize=cache_size)(self._extract_price)
+
+    @staticmethod
+    def clean_text(text: Any) -> Optional[str]:
+        """Clean and normalize text fields."""
+        if not text:
+            return None
+        text = str(text)
+        if '&' in text:
+            # Remove common HTML artifacts
+            text = text.replace('&nbsp;', ' ').replace('&amp;', '&')
+        # Strip and collapse whitespace in one pass
+        text = ' '.join(text.split())
+        return text or None
+
+    def _normalize_service(self, service: str) -> Optional[str]:
+        service = self.clean_text(service)
+        if service is None:
+            return None
+        service = service.lower()
+        matches = [match.group(0) for match in self.service_pattern.finditer(service)]
+        if not matches:
+            return service.title()
+        return self.synonyms[min(matches, key=self.priority.__getitem__)]
+
+    def normalize_services(self, services: Iterable[Any]) -> List[str]:
+        """Map services onto canonical names, dropping blanks and duplicates."""
+        normalized = {self.normalize_service(service) for service in services if service}
+        normalized.discard(None)
+        return sorted(normalized)
+
+    @staticmethod
+    def _extract_price(text: str) -> Optional[float]:
+        match = PRICE_PATTERN.search(text)
+        return float(match.group(1).replace(',', '')) if match else None
+
+    @staticmethod
+    def extract_price_range(text: str) -> List[float]:
+        return [float(value.replace(',', '')) for value in PRICE_PATTERN.findall(text)]
+
+    def normalize_pricing(self, pricing: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize pricing information."""
+        # Convert all prices to float
+        price = pricing.get('starting_price')
+        if isinstance(price, str):
+            pricing['starting_price'] = self.extract_price(price)
+
+        # Normalize price ranges
+        range_text = pricing.get('price_range')
+        if isinstance(range_text, str):
+            prices = self.extract_price_range(range_text)
+            pricing['price_range'] = {
+                'min': prices[0] if prices else None,
+                'max': prices[1] if len(prices) > 1 else None
+            }
+        return pricing
+
+    @staticmethod
+    def _normalize_phone(phone: Any) -> Optional[str]:
+        if not phone:
+            return None
+        return format_phone(NON_DIGIT_PATTERN.sub('', str(phone))) or phone
+
+    def clean_contact_info(self, contact: Dict[str, Any]) -> Dict[str, Any]:
+        """Clean and validate contact information."""
+        if 'phone' in contact:
+            contact['phone'] = self.normalize_phone(contact['phone'])
+        if 'email' in contact:
+            contact['email'] = self.clean_short_text(contact['email'])
+        if 'website' in contact:
+            contact['website'] = self.clean_text(contact['website'])
+        return contact
+
+    @staticmethod
+    def validate_date(date_str: Any) -> str:
+        """Validate and normalize date format."""
+        try:
+            if isinstance(date_str, str):
+                # Parse ISO format date
+                datetime.fromisoformat(date_str)
+            return date_str
+        except (ValueError, TypeError):
+            return datetime.now().isoformat()
+
+    def clean_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Clean and normalize one item in place."""
+        if 'name' in item:
+            item['name'] = self.clean_text(item['name'])
+        if 'description' in item:
+            item['description'] = self.clean_text(item['description'])
+        if 'services' in item:
+            item['services'] = self.normalize_services(item['services'] or ())
+
+        location = item.get('location')
+        if isinstance(location, dict):
+            for key in ('city', 'state'):
+                if key in location:
+                    location[key] = self.clean_short_text(location[key])
+
+        if isinstance(item.get('pricing'), dict):
+            item['pricing'] = self.normalize_pricing(item['pricing'])
+        if isinstance(item.get('contact'), dict):
+            item['contact'] = self.clean_contact_info(item['contact'])
+        if 'last_updated' in item:
+            item['last_updated'] = self.validate_date(item['last_updated'])
+        return item
+
+    def clean_items(self, items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Batch mode: clean a whole dataset, e.g. the records of magicians.json, offline.
+
+        Repeated services, cities, phones and prices hit the caches, so each
+        distinct value is parsed once per batch.
+        """
+        return [self.clean_item(item) for item in items]
+
+    def cache_info(self) -> Dict[str, Any]:
+        return {
+            'services': self.normalize_service.cache_info(),
+            'phones': self.normalize_phone.cache_info(),
+            'short_text': self.clean_short_text.cache_info(),
+            'prices': self.extract_price.cache_info()
+        }
@@ -1,14 +1,57 @@
+import hashlib
 import json
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from datetime import datetime
+import snapshot
+from scraper.item_log import ItemLog
+
+ITEM_LOG_FILENAME = 'magicians.items.jsonl'
 
 class MagicianPipeline:
-    def __init__(self):
+    def __init__(self, batch_size: int = 25, data_dir: Optional[Path] = None):
         self.base_dir = Path(__file__).resolve().parent.parent.parent
-        self.data_dir = self.base_dir / 'data'
+        self.data_dir = Path(data_dir) if data_dir is not None else self.base_dir / 'data'
         self.magicians = []
-        self.existing_magicians = self._load_existing_magicians()
+        self.existing_magicians = None
+        self.positions: Dict[str, int] = {}
+        self.content_hashes: Dict[str, str] = {}
+        self.counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'resumed': 0}
+        # Scraped items go to disk as they arrive and are merged into magicians.json at close
+        self.item_log = ItemLog(self.data_dir / ITEM_LOG_FILENAME, batch_size=batch_size)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(batch_size=crawler.settings.getint('ITEM_LOG_BATCH_SIZE', 25))
+
+    def open_spider(self, spider):
+        # Reuse the copy the spider already loaded instead of parsing the file again
+        self.existing_magicians = getattr(spider, 'existing_magicians', None)
+        if self.existing_magicians is None:
+            self.existing_magicians = self._load_existing_magicians()
+        self._build_index()
+
+        # Items logged by an interrupted crawl count as already scraped
+        for item in self.item_log.replay():
+            self.content_hashes[item['id']] = self._content_hash(item)
+            self.counts['resumed'] += 1
+        if self.counts['resumed']:
+            spider.logger.info(f"Resuming from {self.counts['resumed']} logged items in {self.item_log.path}")
+
+    def _build_index(self):
+        """Index existing magicians by id, once, so upserts don't scan the list."""
+        self.positions = {}
+        self.content_hashes = {}
+        for position, magician in enumerate(self.existing_magicians['magicians']):
+            self.positions[magician['id']] = position
+            self.content_hashes[magician['id']] = self._content_hash(magician)
+
+    @staticmethod
+    def _content_hash(item: Dict[str, Any]) -> str:
+        """Hash an item's content, ignoring when it was scraped."""
+        content = {k: v for k, v in item.items() if k != 'last_updated'}
+        payload = json.dumps(content, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
 
     def _load_existing_magicians(self) -> Dict[str, Any]:
         magicians_file = self.data_dir / 'magicians.json'
@@ -21,20 +64,34 @@ class MagicianPipeline:
         # Clean and validate data
         item = self._clean_item(item)
         
-        # Update existing entry or add new one
-        existing_index = next(
-            (i for i, m in enumerate(self.existing_magicians['magicians'])
-             if m['id'] == item['id']),
-            None
-        )
+        # Log new and changed items; unchanged ones keep the stored record and its last_updated
+        content_hash = self._content_hash(item)
+        previous_hash = self.content_hashes.get(item['id'])
         
-        if existing_index is not None:
-            self.existing_magicians['magicians'][existing_index] = item
-        else:
-            self.existing_magicians['magicians'].append(item)
+        if previous_hash == content_hash:
+            self.counts['unchanged'] += 1
+            return item
+        self.counts['inserted' if previous_hash is None else 'updated'] += 1
+        self.content_hashes[item['id']] = content_hash
+        self.item_log.append(item)
         
         return item
 
+    def _compact(self) -> int:
+        """Merge the item log into existing_magicians, upserting by id."""
+        self.item_log.flush()
+        magicians = self.existing_magicians['magicians']
+        merged = 0
+        for item in self.item_log.replay():
+            existing_index = self.positions.get(item['id'])
+            if existing_index is None:
+                self.positions[item['id']] = len(magicians)
+                magicians.append(item)
+            else:
+                magicians[existing_index] = item
+            merged += 1
+        return merged
+
     def _clean_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
         """Clean and validate magician data."""
         # Remove None values
@@ -50,16 +107,26 @@ class MagicianPipeline:
         if 'name' in item:
             item['name'] = item['name'].strip()
         
-        # Ensure lists are unique
+        # Ensure lists are unique, in a stable order so content hashes are repeatable
         if 'services' in item:
-            item['services'] = list(set(item['services']))
+            item['services'] = sorted(set(item['services']))
         if 'specialties' in item:
-            item['specialties'] = list(set(item['specialties']))
+            item['specialties'] = sorted(set(item['specialties']))
         
         return item
 
     def close_spider(self, spider):
         """Save updated magician data when spider closes."""
+        spider.logger.info(
+            f"Magicians: {self.counts['inserted']} inserted, {self.counts['updated']} updated, "
+            f"{self.counts['unchanged']} unchanged"
+        )
+        for key, value in self.counts.items():
+            spider.crawler.stats.set_value(f'pipeline/{key}', value)
+
+        merged = self._compact()
+        spider.logger.info(f"Compacted {merged} logged items into magicians.json")
+
         output_path = self.data_dir / 'magicians.json'
         output_path.parent.mkdir(exist_ok=True)
         
@@ -72,5 +139,16 @@ class MagicianPipeline:
             self.existing_magicians['magicians']
         )
         
-        with open(output_path, 'w') as f:
+        tmp_path = output_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
             json.dump(self.existing_magicians, f, indent=2)
+        tmp_path.replace(output_path)
+
+        # Compact copy that the site builder prefers over the JSON
+        if snapshot.available():
+            snapshot.write_snapshot(self.data_dir / snapshot.SNAPSHOT_FILENAME, self.existing_magicians)
+        else:
+            spider.logger.info('msgpack is not installed, skipping magicians snapshot')
+
+        # Everything in the log is now in magicians.json
+        self.item_log.remove()
@@ -15,8 +15,13 @@ def setup_logging():
         ]
     )
 
-def run_spider():
-    """Run the magician spider to collect data."""
+def run_spider(incremental: bool = False, max_requests: int = 0, max_seconds: float = 0):
+    """Run the magician spider to collect data.
+
+    With incremental=True only profiles that are due are re-requested, conditionally.
+    max_requests and max_seconds bound the crawl; profiles are fetched in
+    priority order, so a bounded crawl refreshes the most valuable ones.
+    """
     try:
         # Ensure data directory exists
         Path('data').mkdir(exist_ok=True)
@@ -27,10 +32,14 @@ def run_spider():
         
         # Load Scrapy settings
         settings = get_project_settings()
+        if max_requests:
+            settings.set('CLOSESPIDER_PAGECOUNT', max_requests)
+        if max_seconds:
+            settings.set('CLOSESPIDER_TIMEOUT', max_seconds)
         
         # Initialize and run the crawler
         process = CrawlerProcess(settings)
-        process.crawl('magician_spider')
+        process.crawl('magician_spider', incremental=incremental)
         
         logger.info("Starting magician data collection...")
         process.start()
@@ -9,7 +9,7 @@ USER_AGENT = 'MagicianDirectory Bot (+https://example.com/bot)'
 # Obey robots.txt rules
 ROBOTSTXT_OBEY = True
 
-# Configure maximum concurrent requests
+# Configure maximum concurrent requests (the per-domain value caps the adaptive scheduler)
 CONCURRENT_REQUESTS = 16
 CONCURRENT_REQUESTS_PER_DOMAIN = 4
 
@@ -19,8 +19,22 @@ RETRY_TIMES = 3
 RETRY_HTTP_CODES = [500, 502, 503, 504, 408, 429]
 RETRY_PRIORITY_ADJUST = -1
 
-# Configure a delay for requests for the same website
-DOWNLOAD_DELAY = 1
+# DomainRateLimitMiddleware sets each domain's download slot delay and concurrency, so the global delay stays off
+DOWNLOAD_DELAY = 0
+# Hand out requests from the domains with the fewest active downloads first, so a slow
+# domain's backlog does not take up every CONCURRENT_REQUESTS place
+SCHEDULER_PRIORITY_QUEUE = 'scrapy.pqueues.DownloaderAwarePriorityQueue'
+
+# Per-domain minimum delay (seconds); the scheduler backs off above it on 429/503 and error pages
+DOMAIN_DELAYS = {
+    'thebash.com': 3,
+    'bark.com': 2,
+    'gigsalad.com': 2.5,
+}
+DOMAIN_DEFAULT_DELAY = 2
+DOMAIN_MAX_DELAY = 60
+# Learned per-domain delay and concurrency, reused as the next crawl's starting point
+DOMAIN_RATES_FILE = 'data/crawl-rates.json'
 
 # Enable or disable downloader middlewares
 DOWNLOADER_MIDDLEWARES = {
@@ -38,9 +52,16 @@ SPIDER_MIDDLEWARES = {
 
 # Configure item pipelines
 ITEM_PIPELINES = {
+    'scraper.dedup.DuplicateMergePipeline': 200,
     'scraper.pipelines.MagicianPipeline': 300,
 }
 
+# Seconds of fuzzy name matching per crawl before DuplicateMergePipeline stops matching
+DEDUP_TIME_BUDGET = 60
+
+# Items are appended to data/magicians.items.jsonl and fsynced every N items
+ITEM_LOG_BATCH_SIZE = 25
+
 # Enable and configure HTTP caching
 HTTPCACHE_ENABLED = True
 HTTPCACHE_EXPIRATION_SECS = 86400  # 24 hours
@@ -53,11 +74,12 @@ LOG_FORMAT = '%(asctime)s [%(name)s] %(levelname)s: %(message)s'
 
 # Custom settings
 CLOSESPIDER_ERRORCOUNT = 5  # Stop spider after 5 errors
+# Crawl budget (0 = unlimited); profiles are requested highest priority first
+CLOSESPIDER_PAGECOUNT = 0
+CLOSESPIDER_TIMEOUT = 0
+# With a budget, stop following listing pagination once it has used this share of it
+LISTING_BUDGET_SHARE = 0.5
 DOWNLOAD_TIMEOUT = 30  # 30 seconds timeout for requests
 
-# Auto throttle settings
-AUTOTHROTTLE_ENABLED = True
-AUTOTHROTTLE_START_DELAY = 5
-AUTOTHROTTLE_MAX_DELAY = 60
-AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
-AUTOTHROTTLE_DEBUG = False
+# AutoThrottle would fight DomainRateLimitMiddleware over the same delays
+AUTOTHROTTLE_ENABLED = False
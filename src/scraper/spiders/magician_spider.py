@@ -1,23 +1,39 @@
 import scrapy
 import json
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from pathlib import Path
 from urllib.parse import urljoin
-import re
+import time
+
+from scraper.crawl_state import CrawlState
+from scraper.field_specs import SourceSpec, build_sources, extract_fields
+from scraper.frontier import LISTING_BUDGET_SHARE, LISTING_PRIORITY, ProfilePrioritizer, listing_budget_spent
+from scraper.item_log import ItemLog
 
 class MagicianSpider(scrapy.Spider):
     name = 'magician_spider'
     custom_settings = {
         'ROBOTSTXT_OBEY': True,
-        'CONCURRENT_REQUESTS': 16,
-        'DOWNLOAD_DELAY': 2,
         'USER_AGENT': 'MagicianDirectory Bot (+https://example.com/bot)'
     }
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, incremental=False, **kwargs):
         super(MagicianSpider, self).__init__(*args, **kwargs)
+        # Selectors are compiled once here rather than translated on every card
+        self.sources = build_sources()
         self.existing_magicians = self._load_existing_magicians()
+        # Profiles logged by an interrupted crawl are not fetched again
+        self.completed_ids = ItemLog(Path('data/magicians.items.jsonl')).completed_ids()
+        # Spider arguments arrive as strings from the command line (-a incremental=1)
+        self.incremental = str(incremental).lower() in ('1', 'true', 'yes')
+        self.crawl_state = None
+        if self.incremental:
+            self.crawl_state = CrawlState(Path('data/crawl-state.json'))
+            self.crawl_state.seed(self.existing_magicians)
+        self.prioritizer = ProfilePrioritizer(self.existing_magicians)
+        self.listing_pages = 0
+        self.started = time.monotonic()
         
     def _load_existing_magicians(self) -> Dict[str, Any]:
         magicians_file = Path('data/magicians.json')
@@ -26,245 +42,128 @@ class MagicianSpider(scrapy.Spider):
                 return json.load(f)
         return {"magicians": []}
 
-    def start_requests(self):
-        start_urls = {
-            'https://www.thebash.com/services/magician': self.parse_thebash,
-            'https://www.bark.com/en/us/magician/': self.parse_bark,
-            'https://www.gigsalad.com/Magic/Magician': self.parse_gigsalad
-        }
-        
-        for url, callback in start_urls.items():
-            yield scrapy.Request(
-                url=url,
-                callback=callback,
-                errback=self.handle_error,
-                meta={'source': url.split('/')[2]}
-            )
+    def _already_scraped(self, basic_info: Dict[str, Any]) -> bool:
+        if basic_info['id'] not in self.completed_ids:
+            return False
+        self.crawler.stats.inc_value('item_log/skipped_profiles')
+        return True
 
-    def parse_thebash(self, response):
-        """Parse magician listings from TheBash."""
-        magicians = response.css('.vendor-card')
-        
-        for magician in magicians:
-            profile_url = urljoin(response.url, magician.css('.vendor-card__link::attr(href)').get())
-            basic_info = {
-                'id': f"tb_{magician.css('::attr(data-vendor-id)').get()}",
-                'name': magician.css('.vendor-card__name::text').get().strip(),
-                'services': [
-                    service.strip()
-                    for service in magician.css('.vendor-card__categories::text').getall()
-                ],
-                'location': {
-                    'city': magician.css('.vendor-card__location::text').get().split(',')[0].strip(),
-                    'state': magician.css('.vendor-card__location::text').get().split(',')[1].strip(),
-                    'coordinates': {'latitude': None, 'longitude': None}
-                },
-                'rating': float(magician.css('.vendor-card__rating-score::text').get() or 0),
-                'reviews_count': int(magician.css('.vendor-card__rating-count::text').re_first(r'\d+') or 0),
-                'source': 'thebash'
-            }
-            
-            yield scrapy.Request(
+    def _profile_request(self, profile_url: str, spec: SourceSpec, basic_info: Dict[str, Any]) -> Optional[scrapy.Request]:
+        """Build a profile request, or None when an incremental crawl finds the profile is not due."""
+        priority = self.prioritizer.priority(basic_info)
+        if not self.incremental:
+            return scrapy.Request(
                 url=profile_url,
-                callback=self.parse_thebash_profile,
-                meta={'basic_info': basic_info},
+                callback=self.parse_profile,
+                priority=priority,
+                meta={'basic_info': basic_info, 'spec': spec.name},
                 errback=self.handle_error
             )
 
-        next_page = response.css('.pagination__next::attr(href)').get()
-        if next_page:
-            yield response.follow(next_page, self.parse_thebash)
+        if not self.crawl_state.is_due(profile_url):
+            self.crawler.stats.inc_value('incremental/not_due')
+            return None
+        # Freshness is decided by the crawl state, so bypass the blanket HTTP cache
+        return scrapy.Request(
+            url=profile_url,
+            callback=self.parse_profile_if_changed,
+            priority=priority,
+            headers=self.crawl_state.conditional_headers(profile_url),
+            meta={
+                'basic_info': basic_info,
+                'profile_url': profile_url,
+                'spec': spec.name,
+                'handle_httpstatus_list': [304],
+                'dont_cache': True
+            },
+            errback=self.handle_error
+        )
 
-    def parse_thebash_profile(self, response):
-        """Parse detailed magician profile from TheBash."""
+    def parse_profile_if_changed(self, response):
+        """Run the profile parser only when the page changed since the last crawl."""
         basic_info = response.meta['basic_info']
-        
-        profile_data = {
-            **basic_info,
-            'description': response.css('.vendor-bio::text').get('').strip(),
-            'experience_years': self._extract_years(
-                response.css('.vendor-experience::text').get('')
-            ),
-            'performance_types': response.css('.performance-types li::text').getall(),
-            'travel_distance': response.css('.travel-distance::text').get('').strip(),
-            'insurance': {
-                'has_insurance': bool(response.css('.insurance-badge').get()),
-                'details': response.css('.insurance-details::text').get('').strip()
-            },
-            'pricing': {
-                'starting_price': self._extract_price(
-                    response.css('.starting-price::text').get('')
-                ),
-                'price_range': response.css('.price-range::text').get('').strip()
-            },
-            'contact': {
-                'phone': response.css('.contact-phone::text').get(''),
-                'email': response.css('.contact-email::text').get(''),
-                'website': response.url
-            },
-            'social_media': {
-                'facebook': response.css('.social-facebook::attr(href)').get(''),
-                'instagram': response.css('.social-instagram::attr(href)').get(),
-                'youtube': response.css('.social-youtube::attr(href)').get()
-            },
-            'last_updated': datetime.now().isoformat()
-        }
-        
-        yield profile_data
+        changed = self.crawl_state.record(response.meta['profile_url'], basic_info['id'], response)
+        if response.status == 304:
+            self.crawler.stats.inc_value('incremental/not_modified')
+            return
+        if not changed:
+            self.crawler.stats.inc_value('incremental/unchanged')
+            return
+        self.crawler.stats.inc_value('incremental/changed')
+        yield from self.parse_profile(response)
 
-    def parse_bark(self, response):
-        """Parse magician listings from Bark."""
-        magicians = response.css('.professional-card')
-        
-        for magician in magicians:
-            profile_url = urljoin(response.url, magician.css('.pro-profile-link::attr(href)').get())
-            basic_info = {
-                'id': f"bark_{magician.css('::attr(data-pro-id)').get()}",
-                'name': magician.css('.pro-name::text').get().strip(),
-                'services': [
-                    service.strip()
-                    for service in magician.css('.pro-services li::text').getall()
-                ],
-                'location': {
-                    'city': magician.css('.pro-location::text').get().split(',')[0].strip(),
-                    'state': magician.css('.pro-location::text').get().split(',')[1].strip(),
-                    'coordinates': {'latitude': None, 'longitude': None}
-                },
-                'rating': float(magician.css('.pro-rating::text').get() or 0),
-                'reviews_count': int(magician.css('.review-count::text').re_first(r'\d+') or 0),
-                'source': 'bark'
-            }
-            
+    def closed(self, reason):
+        if self.crawl_state is not None:
+            self.crawl_state.save()
+
+    def start_requests(self):
+        for spec in self.sources.values():
             yield scrapy.Request(
-                url=profile_url,
-                callback=self.parse_bark_profile,
-                meta={'basic_info': basic_info},
-                errback=self.handle_error
+                url=spec.start_url,
+                callback=self.parse_listing,
+                errback=self.handle_error,
+                priority=LISTING_PRIORITY,
+                meta={'source': spec.start_url.split('/')[2], 'spec': spec.name}
             )
 
-        next_page = response.css('.pagination-next::attr(href)').get()
-        if next_page:
-            yield response.follow(next_page, self.parse_bark)
+    def _record_parse_time(self, spec: SourceSpec, kind: str, started: float):
+        elapsed_ms = (time.thread_time() - started) * 1000
+        stats = self.crawler.stats
+        stats.inc_value(f'parse/{spec.name}/{kind}_pages')
+        stats.inc_value(f'parse/{spec.name}/{kind}_cpu_ms', elapsed_ms)
+        stats.max_value(f'parse/{spec.name}/{kind}_cpu_ms_max', elapsed_ms)
 
-    def parse_bark_profile(self, response):
-        """Parse detailed magician profile from Bark."""
-        basic_info = response.meta['basic_info']
-        
-        profile_data = {
-            **basic_info,
-            'description': response.css('.pro-description::text').get('').strip(),
-            'badges': response.css('.pro-badges span::text').getall(),
-            'response_time': response.css('.response-time::text').get('').strip(),
-            'services_offered': response.css('.services-list li::text').getall(),
-            'availability': {
-                'days': response.css('.availability-days li::text').getall(),
-                'hours': response.css('.availability-hours::text').get('').strip()
-            },
-            'pricing': {
-                'rate_type': response.css('.rate-type::text').get('').strip(),
-                'rate_range': response.css('.rate-range::text').get('').strip()
-            },
-            'contact': {
-                'phone': None,  # Usually hidden behind contact form
-                'email': None,
-                'website': response.url
-            },
-            'last_updated': datetime.now().isoformat()
-        }
-        
-        yield profile_data
+    def _follow_listings(self) -> bool:
+        """Keep paginating unless listings have used their share of the crawl budget."""
+        settings = self.crawler.settings
+        spent = listing_budget_spent(
+            self.listing_pages,
+            time.monotonic() - self.started,
+            settings.getint('CLOSESPIDER_PAGECOUNT'),
+            settings.getfloat('CLOSESPIDER_TIMEOUT'),
+            settings.getfloat('LISTING_BUDGET_SHARE', LISTING_BUDGET_SHARE)
+        )
+        if spent:
+            self.crawler.stats.inc_value('frontier/listing_budget_reached')
+        return not spent
 
-    def parse_gigsalad(self, response):
-        """Parse magician listings from GigSalad."""
-        magicians = response.css('.performer-card')
-        
-        for magician in magicians:
-            profile_url = urljoin(response.url, magician.css('.performer-link::attr(href)').get())
-            basic_info = {
-                'id': f"gs_{magician.css('::attr(data-performer-id)').get()}",
-                'name': magician.css('.performer-name::text').get().strip(),
-                'services': [
-                    service.strip()
-                    for service in magician.css('.performer-categories span::text').getall()
-                ],
-                'location': {
-                    'city': magician.css('.performer-location::text').get().split(',')[0].strip(),
-                    'state': magician.css('.performer-location::text').get().split(',')[1].strip(),
-                    'coordinates': {'latitude': None, 'longitude': None}
-                },
-                'rating': float(magician.css('.performer-rating::text').get() or 0),
-                'reviews_count': int(magician.css('.review-count::text').re_first(r'\d+') or 0),
-                'source': 'gigsalad'
-            }
-            
-            yield scrapy.Request(
-                url=profile_url,
-                callback=self.parse_gigsalad_profile,
-                meta={'basic_info': basic_info},
-                errback=self.handle_error
-            )
+    def parse_listing(self, response):
+        """Parse magician cards from a listing page of any configured source."""
+        spec = self.sources[response.meta['spec']]
+        self.listing_pages += 1
+        started = time.thread_time()
+        root = response.selector.root
+        cards = [
+            (urljoin(response.url, spec.profile_link.extract(card)), spec.parse_card(card))
+            for card in spec.card.extract(root)
+        ]
+        next_page = spec.next_page.extract(root)
+        self._record_parse_time(spec, 'listing', started)
 
-        next_page = response.css('.pagination__next::attr(href)').get()
-        if next_page:
-            yield response.follow(next_page, self.parse_gigsalad)
+        for profile_url, basic_info in cards:
+            if self._already_scraped(basic_info):
+                continue
 
-    def parse_gigsalad_profile(self, response):
-        """Parse detailed magician profile from GigSalad."""
-        basic_info = response.meta['basic_info']
-        
+            request = self._profile_request(profile_url, spec, basic_info)
+            if request is not None:
+                yield request
+
+        if next_page and self._follow_listings():
+            yield response.follow(next_page, self.parse_listing, meta={'spec': spec.name}, priority=LISTING_PRIORITY)
+
+    def parse_profile(self, response):
+        """Parse a detailed magician profile of any configured source."""
+        spec = self.sources[response.meta['spec']]
+        started = time.thread_time()
         profile_data = {
-            **basic_info,
-            'description': response.css('.bio-content::text').get('').strip(),
-            'performance_length': response.css('.performance-length::text').get('').strip(),
-            'languages': response.css('.languages li::text').getall(),
-            'payment_methods': response.css('.payment-methods li::text').getall(),
-            'cancellation_policy': response.css('.cancellation-policy::text').get('').strip(),
-            'insurance': {
-                'has_insurance': bool(response.css('.insurance-verified').get()),
-                'details': response.css('.insurance-details::text').get('').strip()
-            },
-            'equipment': {
-                'provides': response.css('.equipment-provides li::text').getall(),
-                'needs': response.css('.equipment-needs li::text').getall()
-            },
-            'pricing': {
-                'starting_price': self._extract_price(
-                    response.css('.starting-price::text').get('')
-                ),
-                'packages': [
-                    {
-                        'name': package.css('.package-name::text').get('').strip(),
-                        'price': self._extract_price(
-                            package.css('.package-price::text').get('')
-                        ),
-                        'description': package.css('.package-description::text').get('').strip()
-                    }
-                    for package in response.css('.pricing-package')
-                ]
-            },
-            'contact': {
-                'phone': None,  # Usually hidden behind booking system
-                'email': None,
-                'website': response.url
-            },
-            'last_updated': datetime.now().isoformat()
+            **response.meta['basic_info'],
+            **extract_fields(spec.profile_fields, response.selector.root)
         }
-        
-        yield profile_data
-
-    def _extract_price(self, price_text: str) -> float:
-        """Extract numeric price from text."""
-        if not price_text:
-            return None
-        matches = re.findall(r'\$(\d+(?:,\d+)?(?:\.\d+)?)', price_text)
-        return float(matches[0].replace(',', '')) if matches else None
+        profile_data['contact']['website'] = response.url
+        profile_data['last_updated'] = datetime.now().isoformat()
+        self._record_parse_time(spec, 'profile', started)
 
-    def _extract_years(self, experience_text: str) -> int:
-        """Extract years of experience from text."""
-        if not experience_text:
-            return None
-        matches = re.findall(r'(\d+)(?:\s+)?(?:years?|yrs?)', experience_text.lower())
-        return int(matches[0]) if matches else None
+        yield profile_data
 
     def handle_error(self, failure):
         """Handle request failures and log them."""
@@ -0,0 +1,96 @@
+import gzip
+import io
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from jinja2 import Template
+
+from build_manifest import BuildManifest
+from precompress import remove_variants
+
+
+class SitemapWriter:
+    """Stream URL entries into sitemap-N.xml chunks plus a sitemap_index.xml."""
+
+    MAX_URLS = 50000
+    MAX_BYTES = 50 * 1024 * 1024
+    # Markup around the values of one <url> entry
+    ENTRY_OVERHEAD = 160
+
+    def __init__(
+        self,
+        output_dir: Path,
+        base_url: str,
+        urlset_template: Template,
+        index_template: Template,
+        manifest: Optional[BuildManifest] = None,
+        gzip: bool = False,
+        fingerprint: str = '',
+        max_urls: int = MAX_URLS
+    ):
+        self.output_dir = Path(output_dir)
+        self.base_url = base_url.rstrip('/')
+        self.urlset_template = urlset_template
+        self.index_template = index_template
+        self.manifest = manifest
+        self.gzip = gzip
+        self.fingerprint = fingerprint
+        self.max_urls = min(max_urls, self.MAX_URLS)
+        self.logger = logging.getLogger(__name__)
+        self.paths: List[Path] = []
+        self.written = 0
+        self.skipped = 0
+
+    def write(self, entries: Iterable[Dict]) -> Path:
+        """Write all entries, only rewriting chunks whose entries changed."""
+        sitemaps = []
+        chunk, size = [], 0
+        for entry in entries:
+            entry_size = self.ENTRY_OVERHEAD + sum(len(str(value)) for value in entry.values())
+            if chunk and (len(chunk) >= self.max_urls or size + entry_size > self.MAX_BYTES):
+                sitemaps.append(self._write_chunk(len(sitemaps) + 1, chunk))
+                chunk, size = [], 0
+            chunk.append(entry)
+            size += entry_size
+        if chunk:
+            sitemaps.append(self._write_chunk(len(sitemaps) + 1, chunk))
+
+        index_path = self.output_dir / 'sitemap_index.xml'
+        self._write(index_path, self.index_template, sitemaps=sitemaps)
+        return index_path
+
+    def _write_chunk(self, number: int, entries: List[Dict]) -> Dict:
+        """Write one sitemap chunk and return its sitemap index entry."""
+        suffix = '.xml.gz' if self.gzip else '.xml'
+        chunk_path = self.output_dir / f"sitemap-{number}{suffix}"
+        self._write(chunk_path, self.urlset_template, urls=entries)
+        lastmods = [entry['lastmod'] for entry in entries if entry.get('lastmod')]
+        return {
+            'loc': f"{self.base_url}/{chunk_path.name}",
+            'lastmod': max(lastmods) if lastmods else None
+        }
+
+    def _write(self, path: Path, template: Template, **context):
+        self.paths.append(path)
+        digest = None
+        if self.manifest is not None:
+            digest = self.manifest.hash_inputs(context, self.fingerprint)
+            if self.manifest.is_current(path, digest):
+                self.skipped += 1
+                return
+
+        # Stream the template into a temp file so readers never see a partial sitemap
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as raw:
+            stream = gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0) if path.suffix == '.gz' else raw
+            with io.TextIOWrapper(stream, encoding='utf-8') as f:
+                for piece in template.generate(**context):
+                    f.write(piece)
+        tmp_path.replace(path)
+        remove_variants(path)
+
+        if self.manifest is not None:
+            self.manifest.record(path, digest)
+        self.written += 1
+        self.logger.info(f"Wrote {path.name}")
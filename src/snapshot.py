@@ -0,0 +1,122 @@
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from location_index import LocationIndex, LocationKey, location_key
+
+try:
+    import msgpack
+except ImportError:  # snapshots are optional
+    msgpack = None
+
+SCHEMA_VERSION = 1
+SNAPSHOT_FILENAME = 'magicians.snapshot'
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot:
+    """Compact, lazily decoded copy of magicians.json.
+
+    On disk a snapshot is a msgpack document holding each magician as its own
+    packed record, city/state strings interned into a shared table, and the
+    (city, state) index as record positions. Loading only unpacks the outer
+    document; records are decoded when a city's magicians are requested.
+    """
+
+    def __init__(self, payload: Dict):
+        self.meta = payload['meta']
+        self.strings: List[str] = payload['strings']
+        self.records: List[bytes] = payload['records']
+        self.city_index: Dict[LocationKey, List[int]] = {
+            tuple(key): positions for key, positions in payload['city_index']
+        }
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def magician(self, position: int) -> Dict:
+        """Decode the magician record at the given position."""
+        magician = msgpack.unpackb(self.records[position], raw=False)
+        city, state, extra = magician['location']
+        magician['location'] = {'city': self.strings[city], 'state': self.strings[state], **(extra or {})}
+        return magician
+
+    def iter_magicians(self) -> Iterator[Dict]:
+        for position in range(len(self.records)):
+            yield self.magician(position)
+
+    def location_index(self, cities: Optional[List[Dict]] = None) -> 'SnapshotLocationIndex':
+        return SnapshotLocationIndex(self, cities)
+
+
+class SnapshotLocationIndex(LocationIndex):
+    """LocationIndex over a snapshot's embedded city index, decoding on lookup."""
+
+    def __init__(self, snapshot: Snapshot, cities: Optional[List[Dict]] = None):
+        super().__init__([], cities)
+        self.snapshot = snapshot
+        self._by_location.update(snapshot.city_index)
+        self.magician_count = len(snapshot)
+
+    def _magicians_at(self, key: LocationKey) -> List[Dict]:
+        return [self.snapshot.magician(position) for position in self._by_location.get(key, [])]
+
+
+def available() -> bool:
+    return msgpack is not None
+
+
+def write_snapshot(path: Path, data: Dict[str, Any]):
+    """Write magicians data (the magicians.json document) as a snapshot."""
+    if msgpack is None:
+        raise RuntimeError("msgpack is required to write snapshots")
+
+    strings: List[str] = []
+    string_ids: Dict[str, int] = {}
+    records: List[bytes] = []
+    index: Dict[LocationKey, List[int]] = {}
+
+    def intern(value: Optional[str]) -> int:
+        value = value or ''
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    for position, magician in enumerate(data.get('magicians', [])):
+        location = magician.get('location') or {}
+        extra = {k: v for k, v in location.items() if k not in ('city', 'state')}
+        record = {
+            **magician,
+            'location': [intern(location.get('city')), intern(location.get('state')), extra or None]
+        }
+        records.append(msgpack.packb(record, use_bin_type=True))
+        index.setdefault(location_key(location.get('city'), location.get('state')), []).append(position)
+
+    payload = {
+        'schema_version': SCHEMA_VERSION,
+        'meta': {k: v for k, v in data.items() if k != 'magicians'},
+        'strings': strings,
+        'records': records,
+        'city_index': [[list(key), positions] for key, positions in index.items()]
+    }
+
+    path = Path(path)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(msgpack.packb(payload, use_bin_type=True))
+    tmp_path.replace(path)
+
+
+def read_snapshot(path: Path) -> Optional[Snapshot]:
+    """Read a snapshot, or return None if it is missing or has an unknown schema."""
+    path = Path(path)
+    if msgpack is None or not path.exists():
+        return None
+    with open(path, 'rb') as f:
+        payload = msgpack.unpackb(f.read(), raw=False)
+    if payload.get('schema_version') != SCHEMA_VERSION:
+        logger.warning(f"Ignoring snapshot {path} with schema version {payload.get('schema_version')}")
+        return None
+    return Snapshot(payload)
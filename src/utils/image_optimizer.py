@@ -1,14 +1,150 @@
 from PIL import Image
+import io
+import json
 import os
+import time
 from pathlib import Path
-from typing import Tuple, Dict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 import hashlib
 import asyncio
 import logging
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
+
+# Output directories a worker process has already created
+_created_dirs: Set[Path] = set()
+
+
+def _ensure_dir(path: Path):
+    if path not in _created_dirs:
+        path.mkdir(parents=True, exist_ok=True)
+        _created_dirs.add(path)
+
+
+def _write_variants(
+    data: bytes,
+    output_dirs: Dict[str, Path],
+    name: str,
+    sizes: Dict[str, Tuple[int, int]],
+    quality: int,
+    image_format: str
+) -> Dict[str, Path]:
+    """Encode whichever size variants of an image do not exist yet and return all their paths."""
+    variants = {}
+    pending = []
+    for size_name, dimensions in sizes.items():
+        _ensure_dir(output_dirs[size_name])
+        output_path = output_dirs[size_name] / f"{name}.webp"
+        variants[size_name] = output_path
+        if not output_path.exists():
+            pending.append((output_path, dimensions))
+    if pending:
+        _encode_variants(data, pending, quality, image_format)
+    return variants
+
+
+def _optimize_file(
+    input_path: Path,
+    output_dirs: Dict[str, Path],
+    sizes: Dict[str, Tuple[int, int]],
+    quality: int,
+    image_format: str
+) -> Dict:
+    """Hash and encode every size variant of one image inside a worker process.
+
+    The file is read once; the hash and the decoder both work from those bytes.
+    """
+    start = time.process_time()
+    data = input_path.read_bytes()
+    file_hash = hashlib.md5(data).hexdigest()[:8]
+    variants = _write_variants(data, output_dirs, f"{input_path.stem}-{file_hash}", sizes, quality, image_format)
+    return {
+        'hash': file_hash,
+        'variants': variants,
+        'bytes_in': len(data),
+        'bytes_out': sum(path.stat().st_size for path in variants.values()),
+        'cpu_seconds': time.process_time() - start
+    }
+
+
+def _optimize_bytes(
+    data: bytes,
+    output_dir: Path,
+    sizes: Dict[str, Tuple[int, int]],
+    quality: int,
+    image_format: str
+) -> Dict:
+    """Encode an in-memory image into <output_dir>/<size>/<content hash>.webp in a worker process."""
+    start = time.process_time()
+    content_hash = hashlib.sha256(data).hexdigest()[:16]
+    output_dirs = {size_name: output_dir / size_name for size_name in sizes}
+    variants = _write_variants(data, output_dirs, content_hash, sizes, quality, image_format)
+    return {
+        'hash': content_hash,
+        'variants': variants,
+        'bytes_in': len(data),
+        'bytes_out': sum(path.stat().st_size for path in variants.values()),
+        'cpu_seconds': time.process_time() - start
+    }
+
+
+def _encode_variants(
+    data: bytes, targets: List[Tuple[Path, Tuple[int, int]]], quality: int, image_format: str
+):
+    """Decode an image once and encode every size variant from that decode.
+
+    Sizes are derived in cascade, largest first, each from the previous one.
+    """
+    targets = sorted(targets, key=lambda target: target[1][0] * target[1][1], reverse=True)
+    with Image.open(io.BytesIO(data)) as img:
+        # Palette images only resize with nearest-neighbour, so convert those before resizing
+        if img.mode in ('RGBA', 'P'):
+            img = img.convert('RGB')
+
+        # thumbnail() on the unloaded image drafts JPEGs: libjpeg decodes straight at the
+        # smallest 1/2, 1/4 or 1/8 scale that keeps 2x headroom over the largest variant
+        current = img
+        current.thumbnail(targets[0][1], Image.Resampling.LANCZOS)
+        if current.mode not in ('RGB', 'L'):
+            current = current.convert('RGB')
+
+        for output_path, dimensions in targets:
+            if current.width > dimensions[0] or current.height > dimensions[1]:
+                current = current.copy()
+                current.thumbnail(dimensions, Image.Resampling.LANCZOS)
+            # Write then rename so a killed run never leaves a partial variant. Workers encoding
+            # the same content (identical photos at several URLs) each get their own temp file;
+            # the renames are atomic and the bytes identical, so whichever lands last is fine
+            tmp_path = output_path.with_suffix(f'.{os.getpid()}.tmp')
+            current.save(
+                tmp_path,
+                format=image_format,
+                quality=quality,
+                optimize=True
+            )
+            tmp_path.replace(output_path)
+
 
 class ImageOptimizer:
-    def __init__(self, input_dir: str, output_dir: str):
+    """Optimizes source images into WebP size variants on a process pool.
+
+    A manifest in the output directory maps each source's (size, mtime) to
+    its content hash and variants, so unchanged sources are skipped without
+    being read, and an interrupted run resumes where it stopped.
+    """
+
+    MANIFEST_VERSION = 1
+    PROGRESS_INTERVAL = 5.0
+    # Checkpoint the manifest this often, so an interrupted run loses at most this much work
+    SAVE_EVERY = 100
+    SAVE_INTERVAL = 10.0
+
+    def __init__(
+        self,
+        input_dir: str,
+        output_dir: str,
+        workers: Optional[int] = None,
+        max_in_flight: Optional[int] = None
+    ):
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.logger = logging.getLogger(__name__)
@@ -19,89 +155,178 @@ class ImageOptimizer:
         }
         self.quality = 85
         self.format = 'WEBP'
+        self.workers = workers or os.cpu_count() or 1
+        # Enough queued work to keep every worker busy without holding every image's job at once
+        self.max_in_flight = max_in_flight or self.workers * 2
+        self.manifest_path = self.output_dir / '.image-manifest.json'
+        self.manifest: Dict[str, Dict] = {}
+        self.stats = self._new_stats()
+        self._unsaved = 0
+        self._last_save = 0.0
 
-    async def optimize_images(self):
-        """Optimize all images in the input directory."""
-        self.output_dir.mkdir(exist_ok=True)
-        
-        # Get list of all image files
-        image_files = []
+    @staticmethod
+    def _new_stats() -> Dict[str, float]:
+        return {
+            'images': 0, 'optimized': 0, 'skipped': 0, 'failed': 0,
+            'bytes_in': 0, 'bytes_out': 0, 'cpu_seconds': 0.0, 'seconds': 0.0
+        }
+
+    def _settings_key(self) -> str:
+        """Variants are only reusable while sizes, quality and format stay the same."""
+        payload = json.dumps([self.sizes, self.quality, self.format], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable image manifest {self.manifest_path}: {str(e)}")
+            return {}
+        if manifest.get('version') != self.MANIFEST_VERSION or manifest.get('settings') != self._settings_key():
+            return {}
+        return manifest.get('images', {})
+
+    def save_manifest(self):
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(
+                {'version': self.MANIFEST_VERSION, 'settings': self._settings_key(), 'images': self.manifest},
+                f, indent=2, sort_keys=True
+            )
+        tmp_path.replace(self.manifest_path)
+        self._unsaved = 0
+        self._last_save = time.perf_counter()
+
+    def _checkpoint(self):
+        """Save the manifest once enough results have come in since the last save."""
+        if self._unsaved >= self.SAVE_EVERY or (
+            self._unsaved and time.perf_counter() - self._last_save >= self.SAVE_INTERVAL
+        ):
+            self.save_manifest()
+
+    def _image_files(self) -> Iterator[Path]:
         for ext in ('*.jpg', '*.jpeg', '*.png'):
-            image_files.extend(self.input_dir.glob(f'**/{ext}'))
-
-        # Process images in parallel
-        with ThreadPoolExecutor() as executor:
-            tasks = [
-                self._process_image(img_path, executor)
-                for img_path in image_files
-            ]
-            await asyncio.gather(*tasks)
-
-    async def _process_image(self, image_path: Path, executor):
-        """Process a single image file."""
+            yield from self.input_dir.glob(f'**/{ext}')
+
+    def _is_current(self, key: str, stat: os.stat_result) -> bool:
+        entry = self.manifest.get(key)
+        return (
+            entry is not None
+            and entry['size'] == stat.st_size
+            and entry['mtime'] == stat.st_mtime_ns
+            and all((self.output_dir / variant).exists() for variant in entry['variants'].values())
+        )
+
+    def _output_dirs(self, image_path: Path) -> Dict[str, Path]:
+        relative_path = image_path.relative_to(self.input_dir)
+        return {
+            size_name: self.output_dir / relative_path.parent / size_name
+            for size_name in self.sizes
+        }
+
+    async def optimize_bytes(self, data: bytes, executor: ProcessPoolExecutor) -> Dict:
+        """Encode the size variants of an in-memory image, named by its content hash.
+
+        Used for downloaded photos, which never touch disk before encoding.
+        Returns the worker's result: 'hash', 'variants' (size -> path) and byte counts.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, _optimize_bytes, data, self.output_dir, self.sizes, self.quality, self.format
+        )
+
+    async def optimize_images(self) -> Dict[str, float]:
+        """Optimize all images in the input directory and return run stats."""
+        self.output_dir.mkdir(exist_ok=True)
+        self.manifest = self._load_manifest()
+        self.stats = self._new_stats()
+        loop = asyncio.get_running_loop()
+        start = last_progress = self._last_save = time.perf_counter()
+        in_flight: Dict[asyncio.Future, Tuple[str, os.stat_result, Path]] = {}
+
         try:
-            # Generate hash of image content for cache busting
-            file_hash = self._get_file_hash(image_path)
-            
-            # Process each size variant
-            for size_name, dimensions in self.sizes.items():
-                output_path = self._get_output_path(
-                    image_path, size_name, file_hash
-                )
-                
-                if not output_path.exists():
-                    # Run image processing in thread pool
-                    await asyncio.get_event_loop().run_in_executor(
-                        executor,
-                        self._resize_and_optimize,
-                        image_path,
-                        output_path,
-                        dimensions
-                    )
-                    
-                    self.logger.info(
-                        f"Optimized {image_path.name} - {size_name}"
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                for image_path in self._image_files():
+                    self.stats['images'] += 1
+                    key = image_path.relative_to(self.input_dir).as_posix()
+                    stat = image_path.stat()
+                    if self._is_current(key, stat):
+                        self.stats['skipped'] += 1
+                        continue
+
+                    future = loop.run_in_executor(
+                        executor, _optimize_file, image_path, self._output_dirs(image_path),
+                        self.sizes, self.quality, self.format
                     )
+                    in_flight[future] = (key, stat, image_path)
+                    if len(in_flight) >= self.max_in_flight:
+                        done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                        self._collect(done, in_flight)
+                        self._checkpoint()
 
-        except Exception as e:
-            self.logger.error(
-                f"Error processing {image_path}: {str(e)}"
-            )
+                    if time.perf_counter() - last_progress >= self.PROGRESS_INTERVAL:
+                        last_progress = time.perf_counter()
+                        self._log_progress(last_progress - start)
 
-    def _get_file_hash(self, file_path: Path) -> str:
-        """Generate MD5 hash of file content."""
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()[:8]
-
-    def _get_output_path(
-        self, input_path: Path, size_name: str, file_hash: str
-    ) -> Path:
-        """Generate output path for processed image."""
-        stem = input_path.stem
-        relative_path = input_path.relative_to(self.input_dir)
-        output_path = self.output_dir / relative_path.parent / size_name
-        output_path.mkdir(parents=True, exist_ok=True)
-        return output_path / f"{stem}-{file_hash}.webp"
-
-    def _resize_and_optimize(
-        self, input_path: Path, output_path: Path, dimensions: Tuple[int, int]
-    ):
-        """Resize and optimize a single image."""
-        with Image.open(input_path) as img:
-            # Convert to RGB if necessary
-            if img.mode in ('RGBA', 'P'):
-                img = img.convert('RGB')
-            
-            # Resize image
-            img.thumbnail(dimensions, Image.Resampling.LANCZOS)
-            
-            # Save optimized image
-            img.save(
-                output_path,
-                format=self.format,
-                quality=self.quality,
-                optimize=True
-            )
+                while in_flight:
+                    done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    self._collect(done, in_flight)
+                    self._checkpoint()
+        finally:
+            # Keep whatever finished before an interruption, so the next run resumes from there
+            self._collect([future for future in in_flight if future.done() and not future.cancelled()], in_flight)
+            self.save_manifest()
+
+        self.stats['seconds'] = time.perf_counter() - start
+        self._log_progress(self.stats['seconds'], final=True)
+        return self.stats
+
+    def _collect(self, done, in_flight: Dict[asyncio.Future, Tuple[str, os.stat_result, Path]]):
+        for future in done:
+            key, stat, image_path = in_flight.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                self.stats['failed'] += 1
+                self.logger.error(
+                    f"Error processing {image_path}: {str(e)}"
+                )
+                continue
+
+            variants = {
+                size_name: path.relative_to(self.output_dir).as_posix()
+                for size_name, path in result['variants'].items()
+            }
+            previous = self.manifest.get(key)
+            if previous and previous['hash'] != result['hash']:
+                # The source changed, so its old hash-named variants are orphans now
+                for variant in previous['variants'].values():
+                    (self.output_dir / variant).unlink(missing_ok=True)
+
+            self.manifest[key] = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns,
+                'hash': result['hash'],
+                'variants': variants
+            }
+            self._unsaved += 1
+            self.stats['optimized'] += 1
+            self.stats['bytes_in'] += result['bytes_in']
+            self.stats['bytes_out'] += result['bytes_out']
+            self.stats['cpu_seconds'] += result['cpu_seconds']
+            self.logger.debug(f"Optimized {image_path.name}")
+
+    def _log_progress(self, elapsed: float, final: bool = False):
+        stats = self.stats
+        done = stats['optimized'] + stats['failed']
+        rate = done / elapsed if elapsed else 0.0
+        megabytes = stats['bytes_in'] / elapsed / 1e6 if elapsed else 0.0
+        self.logger.info(
+            f"{'Optimized' if final else 'Optimizing'} images: {stats['images']} seen, "
+            f"{stats['optimized']} optimized, {stats['skipped']} unchanged, {stats['failed']} failed "
+            f"in {elapsed:.1f}s ({rate:.1f} images/s, {megabytes:.1f} MB/s read, "
+            f"{stats['bytes_out'] / 1e6:.1f} MB written)"
+        )
@@ -0,0 +1,200 @@
+import asyncio
+import csv
+import json
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from data_context import PHOTO_COLUMNS
+from utils.image_optimizer import ImageOptimizer
+
+try:
+    import aiohttp
+except ImportError:  # photo ingestion is optional
+    aiohttp = None
+
+
+def photo_urls(csv_path: Path) -> Iterator[str]:
+    """Yield each distinct photo_N URL in a magicians CSV once."""
+    seen = set()
+    with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            for column in PHOTO_COLUMNS:
+                url = (row.get(column) or '').strip()
+                if url and url not in seen:
+                    seen.add(url)
+                    yield url
+
+
+class PhotoIngestor:
+    """Downloads remote photos and stores them as content-addressed WebP variants.
+
+    Downloads share one pooled session with a per-host connection limit and
+    are retried on connection errors, 429 and 5xx. The bytes go straight to
+    the ImageOptimizer's process pool. The map file records each URL's
+    validators and variant URLs; later runs revalidate with conditional GETs,
+    and templates look photos up in the same file.
+    """
+
+    VERSION = 1
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    MAX_RETRY_AFTER = 60.0
+
+    def __init__(
+        self,
+        optimizer: ImageOptimizer,
+        map_path: Path,
+        url_prefix: str = '/static/images/photos',
+        concurrency: int = 32,
+        per_host: int = 4,
+        retries: int = 3,
+        backoff: float = 1.0,
+        timeout: float = 30.0
+    ):
+        self.optimizer = optimizer
+        self.map_path = Path(map_path)
+        self.url_prefix = url_prefix.rstrip('/')
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.logger = logging.getLogger(__name__)
+        self.photos: Dict[str, Dict] = self._load()
+        self.stats = {
+            'urls': 0, 'downloaded': 0, 'not_modified': 0, 'failed': 0, 'retries': 0,
+            'bytes_in': 0, 'bytes_out': 0, 'seconds': 0.0
+        }
+
+    def _load(self) -> Dict[str, Dict]:
+        if not self.map_path.exists():
+            return {}
+        try:
+            with open(self.map_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable photo map {self.map_path}: {str(e)}")
+            return {}
+        if data.get('version') != self.VERSION:
+            return {}
+        return data.get('photos', {})
+
+    def save(self):
+        self.map_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.map_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': self.VERSION, 'photos': self.photos}, f, indent=2, sort_keys=True)
+        tmp_path.replace(self.map_path)
+
+    def _has_variants(self, entry: Dict) -> bool:
+        return all(
+            (self.optimizer.output_dir / size_name / f"{entry['hash']}.webp").exists()
+            for size_name in self.optimizer.sizes
+        )
+
+    def _conditional_headers(self, url: str) -> Dict[str, str]:
+        entry = self.photos.get(url)
+        # Without its variants on disk a 304 would leave nothing to serve
+        if not entry or not self._has_variants(entry):
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after and retry_after.strip().isdigit():
+            return min(float(retry_after), self.MAX_RETRY_AFTER)
+        return self.backoff * 2 ** attempt
+
+    @staticmethod
+    def _validators(response) -> Dict[str, Optional[str]]:
+        return {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+
+    async def _fetch(self, session, url: str) -> Tuple[int, Optional[bytes], Dict[str, Optional[str]]]:
+        """GET a photo, retrying transient failures. Returns (status, body, validators)."""
+        headers = self._conditional_headers(url)
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 200:
+                        return 200, await response.read(), self._validators(response)
+                    if response.status not in self.RETRY_STATUSES:
+                        return response.status, None, self._validators(response)
+                    retry_after = response.headers.get('Retry-After')
+                    error = f"HTTP {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+            if attempt < self.retries:
+                self.stats['retries'] += 1
+                await asyncio.sleep(self._retry_delay(attempt, retry_after))
+        raise IOError(f"giving up after {self.retries + 1} attempts: {error}")
+
+    async def _ingest_one(self, session, executor: ProcessPoolExecutor, url: str):
+        status, body, validators = await self._fetch(session, url)
+        if status == 304:
+            self.stats['not_modified'] += 1
+            return
+        if status != 200:
+            raise IOError(f"HTTP {status}")
+
+        result = await self.optimizer.optimize_bytes(body, executor)
+        self.photos[url] = {
+            'hash': result['hash'],
+            'etag': validators['etag'],
+            'last_modified': validators['last_modified'],
+            'variants': {
+                size_name: f"{self.url_prefix}/{size_name}/{path.name}"
+                for size_name, path in result['variants'].items()
+            }
+        }
+        self.stats['downloaded'] += 1
+        self.stats['bytes_in'] += result['bytes_in']
+        self.stats['bytes_out'] += result['bytes_out']
+
+    async def ingest(self, urls: Iterable[str]) -> Dict[str, float]:
+        """Download, optimize and map every URL, then save the map and return run stats."""
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is required for photo ingestion")
+        start = time.perf_counter()
+        in_flight: Dict[asyncio.Task, str] = {}
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            with ProcessPoolExecutor(max_workers=self.optimizer.workers) as executor:
+                for url in urls:
+                    self.stats['urls'] += 1
+                    task = asyncio.ensure_future(self._ingest_one(session, executor, url))
+                    in_flight[task] = url
+                    # Each task can hold a downloaded body, so bound how many run at once
+                    if len(in_flight) >= self.concurrency:
+                        done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                        self._collect(done, in_flight)
+                if in_flight:
+                    done, _ = await asyncio.wait(in_flight)
+                    self._collect(done, in_flight)
+
+        self.stats['seconds'] = time.perf_counter() - start
+        self.save()
+        self.logger.info(
+            f"Photo ingestion: {self.stats['urls']} URLs, {self.stats['downloaded']} downloaded, "
+            f"{self.stats['not_modified']} not modified, {self.stats['failed']} failed, "
+            f"{self.stats['retries']} retries in {self.stats['seconds']:.1f}s "
+            f"({self.stats['bytes_in'] / 1e6:.1f} MB in, {self.stats['bytes_out'] / 1e6:.1f} MB of variants)"
+        )
+        return self.stats
+
+    def _collect(self, done, in_flight: Dict[asyncio.Task, str]):
+        for task in done:
+            url = in_flight.pop(task)
+            try:
+                task.result()
+            except Exception as e:
+                self.stats['failed'] += 1
+                self.logger.error(f"Error ingesting photo {url}: {str(e)}")
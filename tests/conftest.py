@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# Modules import each other as top-level packages from src/ (scraper, utils);
+# Scrapy's SPIDER_MODULES name them from the repository root (src.scraper.spiders)
+for path in (ROOT, ROOT / 'src'):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
@@ -0,0 +1,68 @@
+import csv
+import json
+import re
+
+from data_context import PHOTO_COLUMNS, PHOTO_MAP_FILENAME, BuildData
+from page_generator import PageGenerator
+
+PHOTO_URL = 'https://lh5.googleusercontent.com/p/AF1QipArlo=w203-h135-k-no'
+PHOTO_HASH = '3f2a9c0d1e7b4a65'
+VARIANT = re.compile(r'<img class="magician-photo" src="/static/images/photos/medium/[0-9a-f]{16}\.webp"')
+
+
+def write_data(data_dir):
+    """A scraped magicians.json, the Google Maps CSV with photo_N URLs, and the ingestion's photo map."""
+    city = {'name': 'Austin', 'state': 'TX', 'coordinates': {'latitude': 30.27, 'longitude': -97.74}}
+    with open(data_dir / 'cities.json', 'w') as f:
+        json.dump({'cities': [city]}, f)
+    magicians = [
+        {
+            'id': 'tb_1001', 'source': 'thebash', 'name': 'Amazing Arlo',
+            'location': {'city': 'Austin', 'state': 'TX', 'coordinates': {'latitude': None, 'longitude': None}},
+            'services': ['Magician'], 'rating': 4.9, 'reviews_count': 37,
+            'contact': {'phone': '(512) 555-0142', 'email': None, 'website': 'https://www.thebash.com/magician/amazing-arlo'}
+        },
+        {
+            'id': 'tb_1003', 'source': 'thebash', 'name': 'Close-Up Carl',
+            'location': {'city': 'Austin', 'state': 'TX', 'coordinates': {'latitude': None, 'longitude': None}},
+            'services': ['Close-up Magic'], 'rating': 5.0, 'reviews_count': 3,
+            'contact': {'phone': None, 'email': None, 'website': 'https://www.thebash.com/magician/close-up-carl'}
+        }
+    ]
+    with open(data_dir / 'magicians.json', 'w') as f:
+        json.dump({'magicians': magicians}, f)
+    with open(data_dir / 'magicians.csv', 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['name', 'city', 'state', 'types', *PHOTO_COLUMNS])
+        writer.writeheader()
+        # Directory listings and Google Maps spell names and places a little differently
+        writer.writerow({'name': 'Amazing Arlo Magic', 'city': 'austin', 'state': 'TX', 'photo_1': PHOTO_URL})
+    with open(data_dir / PHOTO_MAP_FILENAME, 'w') as f:
+        json.dump({'version': 1, 'photos': {PHOTO_URL: {
+            'hash': PHOTO_HASH, 'etag': None, 'last_modified': None,
+            'variants': {size: f'/static/images/photos/{size}/{PHOTO_HASH}.webp' for size in ('thumbnail', 'medium', 'large')}
+        }}}, f)
+    return city
+
+
+def test_city_page_renders_ingested_photo_variants(tmp_path):
+    city = write_data(tmp_path)
+    data = BuildData(tmp_path)
+    generator = PageGenerator('templates', data=data, cache_dir=str(tmp_path / 'jinja'), precompiled=True)
+
+    html = generator.generate_city_page(city)
+
+    images = VARIANT.findall(html)
+    assert len(images) == 1
+    assert f'/static/images/photos/medium/{PHOTO_HASH}.webp' in images[0]
+    assert PHOTO_URL not in html
+
+
+def test_with_photos_joins_csv_rows_without_touching_records(tmp_path):
+    write_data(tmp_path)
+    data = BuildData(tmp_path)
+    magicians = data.location_index.get('Austin', 'TX')
+
+    joined = data.with_photos(magicians)
+
+    assert [magician.get('photos') for magician in joined] == [[PHOTO_URL], None]
+    assert 'photos' not in magicians[0]
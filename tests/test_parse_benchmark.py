@@ -0,0 +1,45 @@
+import gzip
+import json
+import zlib
+from pathlib import Path
+
+import pytest
+from scrapy.http.headers import Headers
+
+from parse_benchmark import FixtureStore, ParseBenchmark, brotli, decode_body, diff_golden
+
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+HTTPCACHE = FIXTURES / 'httpcache' / 'magician_spider'
+GOLDEN = FIXTURES / 'parse_golden.json'
+PAGE = b'<html><body><p class="vendor-bio">Close-up magic</p></body></html>'
+
+
+@pytest.mark.parametrize('encoding, compress', [
+    ('gzip', gzip.compress),
+    ('deflate', zlib.compress),
+    # Raw deflate without the zlib header, as some servers send it
+    ('deflate', lambda body: zlib.compress(body)[2:-4]),
+    ('identity', lambda body: body),
+    pytest.param(
+        'gzip, br', lambda body: brotli.compress(gzip.compress(body)),
+        marks=pytest.mark.skipif(brotli is None, reason='brotli is not installed')
+    ),
+])
+def test_decode_body(encoding, compress):
+    assert decode_body(compress(PAGE), Headers({'Content-Encoding': encoding})) == PAGE
+
+
+def test_httpcache_bodies_are_decoded():
+    store = FixtureStore.from_httpcache(HTTPCACHE)
+    assert len(store.pages) == 9
+    for url, (status, body) in store.pages.items():
+        assert status == 200
+        assert body.startswith(b'<!DOCTYPE html>'), url
+
+
+def test_golden_output():
+    items, stats = ParseBenchmark(FixtureStore.from_httpcache(HTTPCACHE)).run()
+    with open(GOLDEN, 'r') as f:
+        golden = json.load(f)
+    assert stats['missing_pages'] == 0
+    assert diff_golden(items, golden) == []
@@ -0,0 +1,111 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+web = pytest.importorskip('aiohttp.web')
+Image = pytest.importorskip('PIL.Image')
+from aiohttp.test_utils import TestServer  # noqa: E402
+
+from utils.image_optimizer import ImageOptimizer  # noqa: E402
+from utils.photo_ingest import PhotoIngestor  # noqa: E402
+
+SAME_PHOTO_URLS = 24
+
+
+def _jpeg(color) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (1200, 900), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def photo_app() -> web.Application:
+    """Stand-in photo host: validators and 304s, a flaky photo, a missing one, and shared bytes."""
+    photos = {'red': _jpeg((200, 30, 30)), 'blue': _jpeg((30, 30, 200))}
+    hits = {'flaky': 0}
+
+    async def photo(request):
+        name = request.match_info['name']
+        etag = f'"{name}-v1"'
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304)
+        return web.Response(body=photos[name], content_type='image/jpeg', headers={'ETag': etag})
+
+    async def flaky(request):
+        hits['flaky'] += 1
+        if hits['flaky'] == 1:
+            return web.Response(status=503, headers={'Retry-After': '0'})
+        return web.Response(body=photos['blue'], content_type='image/jpeg')
+
+    async def same(request):
+        return web.Response(body=photos['red'], content_type='image/jpeg')
+
+    async def missing(request):
+        return web.Response(status=404)
+
+    app = web.Application()
+    app.router.add_get('/photos/{name}.jpg', photo)
+    app.router.add_get('/flaky.jpg', flaky)
+    app.router.add_get('/same/{number}.jpg', same)
+    app.router.add_get('/missing.jpg', missing)
+    return app
+
+
+def ingest(tmp_path, urls_for, runs=1):
+    """Ingest against one stand-in server, runs times in a row; returns each run's ingestor and the URLs."""
+    async def run():
+        server = TestServer(photo_app())
+        await server.start_server()
+        try:
+            urls = urls_for(server)
+            ingestors = []
+            for _ in range(runs):
+                optimizer = ImageOptimizer(str(tmp_path / 'photos'), str(tmp_path / 'photos'), workers=4)
+                ingestor = PhotoIngestor(optimizer, tmp_path / 'photo-variants.json', concurrency=16, backoff=0)
+                await ingestor.ingest(urls)
+                ingestors.append(ingestor)
+            return ingestors, urls
+        finally:
+            await server.close()
+    return asyncio.run(run())
+
+
+def test_ingest_downloads_retries_and_maps_photos(tmp_path):
+    (ingestor,), urls = ingest(tmp_path, lambda server: [
+        str(server.make_url('/photos/red.jpg')),
+        str(server.make_url('/flaky.jpg')),
+        str(server.make_url('/missing.jpg')),
+        *[str(server.make_url(f'/same/{number}.jpg')) for number in range(SAME_PHOTO_URLS)]
+    ])
+    red, flaky, missing, *same = urls
+
+    assert ingestor.stats['failed'] == 1
+    assert ingestor.stats['retries'] == 1
+    assert ingestor.stats['downloaded'] == len(urls) - 1
+    assert missing not in ingestor.photos
+
+    # Every URL serving the red photo maps to the same content-addressed variants
+    assert {ingestor.photos[url]['hash'] for url in [red, *same]} == {ingestor.photos[red]['hash']}
+    assert ingestor.photos[flaky]['hash'] != ingestor.photos[red]['hash']
+    for entry in ingestor.photos.values():
+        for size_name, variant_url in entry['variants'].items():
+            assert variant_url == f"/static/images/photos/{size_name}/{entry['hash']}.webp"
+            assert (tmp_path / 'photos' / size_name / f"{entry['hash']}.webp").exists()
+    assert not list((tmp_path / 'photos').rglob('*.tmp'))
+
+    with open(tmp_path / 'photo-variants.json', 'r') as f:
+        assert json.load(f)['photos'] == ingestor.photos
+
+
+def test_ingest_revalidates_with_conditional_requests(tmp_path):
+    def urls_for(server):
+        return [str(server.make_url('/photos/red.jpg')), str(server.make_url('/photos/blue.jpg'))]
+
+    (first, second), _ = ingest(tmp_path, urls_for, runs=2)
+    assert first.stats['downloaded'] == 2
+    assert all(entry['etag'] for entry in first.photos.values())
+
+    assert second.stats['not_modified'] == 2
+    assert second.stats['downloaded'] == 0
+    assert second.photos == first.photos
@@ -0,0 +1,32 @@
+import asyncio
+
+from build_manifest import BuildManifest
+from output_writer import OutputWriter
+from precompress import Precompressor
+
+
+def build(output_dir, pages, precompress):
+    """One incremental build of {name: content} city pages, optionally precompressed."""
+    async def run():
+        manifest = BuildManifest(output_dir, incremental=True)
+        writer = OutputWriter()
+        paths = [output_dir / 'magicians' / f'{name}.html' for name in pages]
+        for path, content in zip(paths, pages.values()):
+            await writer.write(path, content * 500, lambda path=path, content=content: manifest.record(path, content))
+        await writer.close()
+        manifest.prune('magicians/', paths)
+        manifest.save()
+    asyncio.run(run())
+    if precompress:
+        Precompressor(output_dir, workers=1).run()
+
+
+def test_rewritten_and_pruned_pages_lose_their_variants(tmp_path):
+    build(tmp_path, {'napa-ca': 'old', 'robbinsdale-mn': 'old'}, precompress=True)
+    assert (tmp_path / 'magicians' / 'napa-ca.html.gz').exists()
+    assert (tmp_path / 'magicians' / 'robbinsdale-mn.html.gz').exists()
+
+    # Rebuilt without --precompress: no sibling may keep serving the old napa-ca page,
+    # and the dropped city leaves nothing behind for gzip_static
+    build(tmp_path, {'napa-ca': 'new'}, precompress=False)
+    assert sorted(path.name for path in (tmp_path / 'magicians').iterdir()) == ['napa-ca.html']
@@ -0,0 +1,27 @@
+import math
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+
+from scraper.normalizer import Normalizer  # noqa: E402
+from scripts.renormalize_data import extract_prices  # noqa: E402
+
+STARTING_PRICES = [300, 1250.5, '$1,200', 'Starting at $75', '2 hours - $300', 'Call for pricing', None]
+
+
+def _per_item(value):
+    return Normalizer().normalize_pricing({'starting_price': value})['starting_price']
+
+
+def test_extract_prices_matches_normalizer():
+    first, _ = extract_prices(pd.Series(STARTING_PRICES, dtype=object))
+    bulk = [None if math.isnan(price) else price for price in first]
+    assert bulk == [_per_item(value) for value in STARTING_PRICES]
+    assert bulk[:3] == [300, 1250.5, 1200]
+
+
+def test_extract_prices_reads_both_ends_of_a_range():
+    first, second = extract_prices(pd.Series(['$300 - $800', '$1,000', None], dtype=object))
+    assert list(first.fillna(-1)) == [300, 1000, -1]
+    assert list(second.fillna(-1)) == [800, -1, -1]